@@ -0,0 +1,117 @@
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from authapp.models import User
+from authapp.serializers import UserBulkSerializer
+
+BULK_CREATE_BATCH_SIZE = getattr(settings, 'USER_BULK_CREATE_BATCH_SIZE', 500)
+BULK_HASH_WORKERS = getattr(settings, 'USER_BULK_HASH_WORKERS', None) or os.cpu_count() or 1
+
+_executor = None
+
+
+def get_executor():
+    """
+    Пул процессов для хеширования паролей, создаётся при первом обращении
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=BULK_HASH_WORKERS)
+        atexit.register(_executor.shutdown)
+    return _executor
+
+
+def hash_passwords(passwords):
+    """
+    Хеширует пароли параллельно во всех процессах пула
+    """
+    if BULK_HASH_WORKERS == 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (BULK_HASH_WORKERS * 4))
+    return list(get_executor().map(make_password, passwords, chunksize=chunksize))
+
+
+def iter_batches(items, size):
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_create_users(items, batch_size=BULK_CREATE_BATCH_SIZE):
+    """
+    Создаёт пользователей пачками и возвращает результат по каждому элементу в порядке поступления
+    """
+    results = []
+    seen = set()
+    index = 0
+    for batch in iter_batches(items, batch_size):
+        valid = []
+        for item in batch:
+            serializer = UserBulkSerializer(data=item)
+            if not serializer.is_valid():
+                results.append({'index': index, 'status': 'error', 'errors': serializer.errors})
+            else:
+                data = serializer.validated_data
+                data['username'] = User.normalize_username(data['username'])
+                data['email'] = User.objects.normalize_email(data.get('email', ''))
+                if data['username'] in seen:
+                    results.append({'index': index, 'status': 'error',
+                                    'errors': {'username': ['Имя пользователя повторяется в запросе']}})
+                else:
+                    seen.add(data['username'])
+                    valid.append((index, data))
+            index += 1
+        results.extend(_create_batch(valid))
+    results.sort(key=lambda result: result['index'])
+    return results
+
+
+def _create_batch(valid):
+    existing = set(User.objects.filter(
+        username__in=[data['username'] for _, data in valid],
+    ).values_list('username', flat=True))
+    results = []
+    pending = []
+    for index, data in valid:
+        if data['username'] in existing:
+            results.append({'index': index, 'status': 'error',
+                            'errors': {'username': ['Пользователь с таким именем уже существует']}})
+        else:
+            pending.append((index, data))
+    if not pending:
+        return results
+
+    hashed = hash_passwords([data['password'] for _, data in pending])
+    users = [User(**{**data, 'password': password}) for (_, data), password in zip(pending, hashed)]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+    except IntegrityError:
+        # Конкурентная вставка того же имени: сохраняем поштучно, чтобы отделить конфликтные записи
+        return results + _create_one_by_one(pending, users)
+    results.extend(
+        {'index': index, 'status': 'created', 'id': user.pk, 'username': user.username}
+        for (index, _), user in zip(pending, users)
+    )
+    return results
+
+
+def _create_one_by_one(pending, users):
+    results = []
+    for (index, _), user in zip(pending, users):
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            results.append({'index': index, 'status': 'error',
+                            'errors': {'username': ['Пользователь с таким именем уже существует']}})
+        else:
+            results.append({'index': index, 'status': 'created', 'id': user.pk, 'username': user.username})
+    return results
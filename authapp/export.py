@@ -0,0 +1,46 @@
+from datetime import timezone as dt_timezone
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from authapp.models import User
+
+EXPORT_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'patronymic', 'age',
+    'is_active', 'is_staff', 'is_superuser', 'last_login', 'date_joined',
+    'created_at', 'updated_at',
+)
+EXPORT_CHUNK_SIZE = 2000
+
+
+def parse_updated_filter(value):
+    """
+    Разбирает значение фильтра updated_at (ISO 8601), None если формат неверный
+    """
+    try:
+        value = parse_datetime(value)
+    except ValueError:
+        return None
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+def export_queryset(updated_after=None, updated_before=None):
+    """
+    Выборка пользователей для выгрузки, инкрементально по updated_at
+    """
+    queryset = User.objects.order_by('updated_at', 'id')
+    if updated_after is not None:
+        queryset = queryset.filter(updated_at__gt=updated_after)
+    if updated_before is not None:
+        queryset = queryset.filter(updated_at__lte=updated_before)
+    return queryset.values(*EXPORT_FIELDS)
+
+
+def iter_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Построчно отдаёт выборку в формате NDJSON, читая её курсором на стороне сервера
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield encoder.encode(row) + '\n'
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from authapp.export import EXPORT_CHUNK_SIZE, export_queryset, iter_ndjson, parse_updated_filter
+
+
+class Command(BaseCommand):
+    help = "Выгружает пользователей в формате NDJSON (построчно, без загрузки таблицы в память)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updated-after', help='Только пользователи, изменённые после указанного времени (ISO 8601)')
+        parser.add_argument('--updated-before', help='Только пользователи, изменённые не позже указанного времени')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument('-o', '--output', help='Файл для выгрузки, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        filters = {}
+        for name in ('updated_after', 'updated_before'):
+            if options[name]:
+                filters[name] = parse_updated_filter(options[name])
+                if filters[name] is None:
+                    raise CommandError(f'Неверный формат даты: {options[name]}')
+        lines = iter_ndjson(export_queryset(**filters), chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
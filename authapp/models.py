@@ -10,3 +10,8 @@ class User(AbstractUser):
     patronymic = models.CharField(max_length=150, verbose_name='Отчество', **NULLABLE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=('updated_at', 'id'), name='user_updated_at_idx'),
+        ]
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    """Постраничный вывод пользователей по курсору (keyset по id)"""
+    ordering = 'id'
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
@@ -0,0 +1,27 @@
+import json
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Построчный разбор NDJSON: возвращает генератор объектов, тело запроса не читается целиком.
+    Строка с некорректным JSON возвращается как есть и отклоняется при валидации элемента
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return self.iter_items(stream, encoding)
+
+    @staticmethod
+    def iter_items(stream, encoding):
+        for line in stream:
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
@@ -1,3 +1,4 @@
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework import serializers
 from authapp.models import User
 
@@ -22,3 +23,33 @@ class UserSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+
+class UserListSerializer(serializers.ModelSerializer):
+    """Облегчённый сериализатор для списка пользователей"""
+    default_fields = ('id', 'username', 'email', 'first_name', 'last_name', 'patronymic', 'is_active')
+
+    class Meta:
+        model = User
+        fields = (
+            'id', 'username', 'email', 'first_name', 'last_name', 'patronymic', 'age',
+            'is_active', 'is_staff', 'is_superuser', 'last_login', 'date_joined',
+            'created_at', 'updated_at', 'groups', 'user_permissions',
+        )
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = set(fields or self.default_fields)
+        for name in set(self.fields) - selected:
+            self.fields.pop(name)
+
+
+class UserBulkSerializer(serializers.ModelSerializer):
+    """Сериализатор элемента массового создания пользователей.
+    Уникальность имени проверяется одним запросом на пачку, а не на каждый элемент"""
+    class Meta:
+        model = User
+        fields = ('username', 'password', 'email', 'first_name', 'last_name', 'patronymic', 'age')
+        extra_kwargs = {
+            'username': {'validators': [UnicodeUsernameValidator()]},
+            'password': {'write_only': True},
+        }
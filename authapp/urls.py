@@ -6,6 +6,8 @@ app_name = 'authapp'
 
 urlpatterns = [
     path('api/user_create/', authapp.UserCreateAPIView.as_view(), name='api_user_create'),
+    path('api/user_bulk_create/', authapp.UserBulkCreateAPIView.as_view(), name='api_user_bulk_create'),
+    path('api/user_export/', authapp.UserExportAPIView.as_view(), name='api_user_export'),
     path('api/user_update/<int:pk>/', authapp.UserUpdateAPIView.as_view(), name='api_user_update'),
 ]
 
@@ -1,20 +1,51 @@
-from django.http import Http404
+from types import GeneratorType
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import status
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from authapp.bulk import bulk_create_users
+from authapp.export import export_queryset, iter_ndjson, parse_updated_filter
 from authapp.models import User
-from authapp.serializers import UserSerializer
+from authapp.pagination import UserCursorPagination
+from authapp.parsers import NDJSONParser
+from authapp.serializers import UserListSerializer, UserSerializer
 from rest_framework.permissions import IsAuthenticated
 
+M2M_FIELDS = ('groups', 'user_permissions')
+
 
 class UserCreateAPIView(APIView):
     """API Создание пользователя"""
     permission_classes = (IsAuthenticated,)
+    pagination_class = UserCursorPagination
+
+    def get_fields(self, request):
+        """
+        Список полей из параметра ?fields=id,username; по умолчанию облегчённый набор
+        """
+        fields = request.query_params.get('fields')
+        if not fields:
+            return UserListSerializer.default_fields
+        fields = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+        unknown = set(fields) - set(UserListSerializer.Meta.fields)
+        if unknown:
+            return None
+        return fields
 
     def get(self, request):
-        item = User.objects.all()
-        serializer = UserSerializer(item, many=True)
-        return Response(serializer.data)
+        fields = self.get_fields(request)
+        if fields is None:
+            return Response({'fields': 'Неизвестные поля'}, status=status.HTTP_400_BAD_REQUEST)
+        m2m = [name for name in fields if name in M2M_FIELDS]
+        concrete = {'id', *(name for name in fields if name not in M2M_FIELDS)}
+        item = User.objects.only(*concrete)
+        if m2m:
+            item = item.prefetch_related(*m2m)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(item, request, view=self)
+        serializer = UserListSerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = UserSerializer(data=request.data)
@@ -25,6 +56,42 @@ class UserCreateAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class UserBulkCreateAPIView(APIView):
+    """API Массовое создание пользователей (JSON массив или NDJSON поток)"""
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (JSONParser, NDJSONParser)
+
+    def post(self, request):
+        items = request.data
+        # JSON массив или генератор NDJSONParser; объект, строка или число - ошибка клиента
+        if not isinstance(items, (list, GeneratorType)):
+            return Response({'detail': 'Ожидается массив пользователей'}, status=status.HTTP_400_BAD_REQUEST)
+        results = bulk_create_users(items)
+        created = sum(1 for result in results if result['status'] == 'created')
+        data = {'created': created, 'failed': len(results) - created, 'results': results}
+        if created == len(results):
+            return Response(data, status=status.HTTP_201_CREATED)
+        return Response(data, status=status.HTTP_207_MULTI_STATUS)
+
+
+class UserExportAPIView(APIView):
+    """API Потоковая выгрузка пользователей в NDJSON (?updated_after=, ?updated_before=)"""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        filters = {}
+        for name in ('updated_after', 'updated_before'):
+            value = request.query_params.get(name)
+            if value:
+                filters[name] = parse_updated_filter(value)
+                if filters[name] is None:
+                    return Response({name: 'Неверный формат даты'}, status=status.HTTP_400_BAD_REQUEST)
+        return StreamingHttpResponse(
+            iter_ndjson(export_queryset(**filters)),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+
+
 class UserUpdateAPIView(APIView):
     """API Изменение пользователя"""
     permission_classes = (IsAuthenticated, )
@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'jwtapp.middleware.AccessTokenRenewalMiddleware',
 ]
 
 ROOT_URLCONF = 'jwtaccess.urls'
@@ -98,6 +99,13 @@ DATABASES = {
     }
 }
 
+# Чтения токенов и пользователей идут на реплику, если задан JWTAPP['READ_REPLICA_DATABASE'],
+# токены распределяются по шардам, если задан JWTAPP['TOKEN_SHARDS']
+DATABASE_ROUTERS = [
+    'jwtapp.routers.TokenShardRouter',
+    'jwtapp.routers.AuthReadReplicaRouter',
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -117,6 +125,15 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+PASSWORD_HASHERS = [
+    'jwtapp.hashers.TunedPBKDF2PasswordHasher',
+    'jwtapp.hashers.TunedBCryptSHA256PasswordHasher',
+    'jwtapp.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
@@ -160,22 +177,80 @@ JWTAPP = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': False,
     'UPDATE_LAST_LOGIN': False,
+    # Секунды между пакетной записью last_login, None - запись при каждом входе
+    'LAST_LOGIN_FLUSH_INTERVAL': 5,
 
+    # EdDSA или ES256 с ключами от python3 manage.py generatesigningkeys: другие сервисы проверяют токены
+    # по открытому ключу или JWKS. VERIFYING_KEY = None - открытый ключ выводится из SIGNING_KEY
     'ALGORITHM': 'HS512',
     'SIGNING_KEY': SECRET_KEY,
     'VERIFYING_KEY': None,
+    # kid в заголовке JWT, должен совпадать с kid ключа в опубликованном JWKS
+    'SIGNING_KEY_ID': None,
+    # Проверка ключей против ALGORITHM при запуске (ImproperlyConfigured вместо ошибки на первом запросе)
+    'VALIDATE_KEYS_ON_READY': True,
     'AUDIENCE': None,
     'ISSUER': None,
     'JWK_URL': None,
     'LEEWAY': 0,
+    # Часы в секундах epoch: 'jwtapp.utils.SystemClock', 'jwtapp.utils.CachedClock' (раз в секунду) или None
+    'CLOCK': None,
 
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
 
-    'AUTH_TOKEN_CLASSES': ('jwtapp.tokens.AccessToken',),
+    'AUTH_TOKEN_CLASSES': ('jwtapp.tokens.AccessToken', 'jwtapp.tokens.SlidingToken'),
     'TOKEN_TYPE_CLAIM': 'token_type',
 
     'JTI_CLAIM': 'jti',
+    # 'jwt', 'compact' (короткие claims) или 'cwt' (CBOR/COSE, нужен cbor2); проверка принимает все три
+    'TOKEN_FORMAT': 'jwt',
+
+    'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
+    'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
+
+    'ACCESS_TOKEN_RENEW_WINDOW': timedelta(minutes=1),
+    'ACCESS_TOKEN_RENEW_HEADER': 'X-Access-Token',
+    # Продление не дальше iat + срок (None - REFRESH_TOKEN_LIFETIME), после завершения всех сессий не продлевается
+    'ACCESS_TOKEN_RENEW_MAX_AGE': None,
+
+    'ROTATION_GRACE_PERIOD': timedelta(seconds=30),
+    'ROTATION_CACHE_MAX_SIZE': 10000,
+    'ROTATION_CACHE_ALIAS': None,
+
+    'READ_REPLICA_DATABASE': None,
+    'READ_REPLICA_PIN_SECONDS': 5,
+    'TOKEN_SHARDS': (),
+    # False: OutstandingToken создаётся только при отзыве токена, списки сессий при этом пусты
+    'TRACK_OUTSTANDING_TOKENS': True,
+    # timedelta: токены хранятся в отдельных таблицах по периодам expires_at (не партициях PostgreSQL),
+    # истёкшие периоды удаляются целиком
+    'TOKEN_BUCKET_PERIOD': None,
+    # Разбор настроек и ключей при запуске, а не на первом запросе
+    'WARM_UP_ON_READY': True,
+
+    # Параметры jwtapp.hashers.Tuned*: словарь или JSON файл от python3 manage.py calibratehashers --write
+    'PASSWORD_HASH_PARAMS': None,
+
+    # Секунд между опросами новых записей черного списка; None - проверка в БД на каждый токен
+    'REVOCATION_FEED_INTERVAL': None,
+    'REVOCATION_FEED_MAX_BATCH': 10000,
+    'REVOCATION_FEED_OVERLAP': 5,
+
+    # Ограничение входа: корзины по IP и имени пользователя ('N/sec|min|hour|day'), до хеширования пароля
+    'TOKEN_OBTAIN_IP_RATE': '60/min',
+    'TOKEN_OBTAIN_USERNAME_RATE': '10/min',
+    # Одновременных входов на процесс, сверх лимита - 503 с Retry-After
+    'TOKEN_OBTAIN_MAX_CONCURRENT': 8,
+    # Алиас кеша для общих между процессами корзин, None - в памяти процесса
+    'THROTTLE_CACHE_ALIAS': None,
+
+    # 'jwtapp.audit.JSONLFileSink', 'jwtapp.audit.DatabaseSink', 'jwtapp.audit.StdoutSink' или None
+    'AUDIT_SINK': None,
+    'AUDIT_FILE_PATH': BASE_DIR / 'audit.jsonl',
+    'AUDIT_QUEUE_SIZE': 10000,
+    'AUDIT_QUEUE_POLICY': 'drop',
 }
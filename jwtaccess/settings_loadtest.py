@@ -0,0 +1,21 @@
+"""
+Настройки для python3 manage.py loadtest --sqlite: локальная SQLite база вместо PostgreSQL и без ограничения
+входа (все клиенты теста входят с одного адреса под несколькими именами)
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, JWTAPP
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'loadtest.sqlite3',
+        'OPTIONS': {'timeout': 20},
+    }
+}
+
+JWTAPP = {
+    **JWTAPP,
+    'TOKEN_OBTAIN_IP_RATE': None,
+    'TOKEN_OBTAIN_USERNAME_RATE': None,
+    'TOKEN_OBTAIN_MAX_CONCURRENT': None,
+}
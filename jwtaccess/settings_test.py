@@ -0,0 +1,35 @@
+"""
+Настройки для python3 manage.py test --settings=jwtaccess.settings_test: SQLite вместо PostgreSQL,
+дополнительные алиасы для проверки реплики ('replica') и шардов токенов ('shard0', 'shard1').
+'shared' - SQLite в файле: его видят процессы, запущенные тестом через fork
+"""
+import tempfile
+from pathlib import Path
+from .settings import *  # noqa: F401,F403
+from .settings import JWTAPP
+
+DATABASES = {
+    alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+    for alias in ('default', 'replica', 'shard0', 'shard1')
+}
+DATABASES['shared'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': Path(tempfile.gettempdir()) / 'jwtaccess_shared.sqlite3',
+    'TEST': {'NAME': str(Path(tempfile.gettempdir()) / 'test_jwtaccess_shared.sqlite3')},
+    'OPTIONS': {'timeout': 30},
+}
+
+# Быстрый хеш: тесты проверяют токены, а не стоимость пароля
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+JWTAPP = {
+    **JWTAPP,
+    'UPDATE_LAST_LOGIN': False,
+    'ACCESS_TOKEN_RENEW_WINDOW': None,
+    'ROTATION_GRACE_PERIOD': None,
+    'WARM_UP_ON_READY': False,
+    'TOKEN_OBTAIN_IP_RATE': None,
+    'TOKEN_OBTAIN_USERNAME_RATE': None,
+    'TOKEN_OBTAIN_MAX_CONCURRENT': None,
+    'AUDIT_SINK': None,
+}
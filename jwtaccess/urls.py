@@ -3,8 +3,12 @@ from django.urls import path, include
 from jwtapp.views import (
     TokenObtainPairView,
     TokenRefreshView,
+    TokenObtainSlidingView,
+    TokenRefreshSlidingView,
     TokenBlacklistView,
     RotatedRefreshTokenView,
+    SessionListView,
+    SessionRevokeAllView,
 )
 
 urlpatterns = [
@@ -13,4 +17,8 @@ urlpatterns = [
     # JWT tokens
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/rotated/', RotatedRefreshTokenView.as_view(), name='token_rotated'),
+    path('api/token/sliding/', TokenObtainSlidingView.as_view(), name='token_obtain_sliding'),
+    path('api/token/sliding/refresh/', TokenRefreshSlidingView.as_view(), name='token_refresh_sliding'),
+    path('api/token/sessions/', SessionListView.as_view(), name='token_sessions'),
+    path('api/token/sessions/revoke/', SessionRevokeAllView.as_view(), name='token_sessions_revoke'),
 ]
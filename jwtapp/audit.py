@@ -0,0 +1,208 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from django.db import close_old_connections
+from .settings import api_settings
+
+POLICY_DROP = 'drop'
+POLICY_BLOCK = 'block'
+
+
+class JSONLFileSink:
+    """
+    Пишет события в JSONL файл AUDIT_FILE_PATH с ротацией по размеру
+    """
+
+    def __init__(self):
+        self.path = api_settings.AUDIT_FILE_PATH
+        self.max_bytes = api_settings.AUDIT_FILE_MAX_BYTES
+        self.backup_count = api_settings.AUDIT_FILE_BACKUP_COUNT
+
+    def rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+    def write(self, events):
+        if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            self.rotate()
+        with open(self.path, 'a', encoding='utf-8') as output:
+            output.writelines(json.dumps(event, ensure_ascii=False, default=str) + '\n' for event in events)
+
+
+class StdoutSink:
+    """
+    Пишет события в stdout в формате JSONL
+    """
+
+    def write(self, events):
+        sys.stdout.writelines(json.dumps(event, ensure_ascii=False, default=str) + '\n' for event in events)
+        sys.stdout.flush()
+
+
+class DatabaseSink:
+    """
+    Сохраняет события в таблицу AuditEvent одним bulk_create на пачку
+    """
+
+    def write(self, events):
+        from .tokens_models.models import AuditEvent
+        from .utils import datetime_from_epoch
+        try:
+            AuditEvent.objects.bulk_create([
+                AuditEvent(
+                    event=event['event'],
+                    jti=event.get('jti') or '',
+                    user_id=str(event.get('user_id') or ''),
+                    token_type=event.get('token_type') or '',
+                    detail=json.dumps(event['detail'], ensure_ascii=False, default=str) if event.get('detail') else '',
+                    created_at=datetime_from_epoch(event['ts']),
+                )
+                for event in events
+            ])
+        finally:
+            close_old_connections()
+
+
+class AuditLog:
+    """
+    Очередь событий жизненного цикла токенов. События записываются пачками фоновым потоком,
+    при переполнении очереди событие отбрасывается (drop) или запись ожидает места (block)
+    """
+
+    def __init__(self, sink, queue_size, policy, batch_size, flush_interval):
+        self.sink = sink
+        self.policy = policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0}
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # После fork поток не наследуется: запускаем новый в каждом процессе
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self.run, name='jwtapp-audit', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def record(self, event):
+        self.ensure_started()
+        try:
+            if self.policy == POLICY_BLOCK:
+                self.queue.put(event)
+            else:
+                self.queue.put_nowait(event)
+        except queue.Full:
+            self.counters['dropped'] += 1
+            return
+        self.counters['enqueued'] += 1
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.write_batch(self.next_batch())
+        self.drain()
+
+    def next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+        self.write_batch(batch)
+
+    def write_batch(self, batch):
+        if not batch:
+            return
+        try:
+            self.sink.write(batch)
+        except Exception:
+            self.counters['failed'] += len(batch)
+        else:
+            self.counters['written'] += len(batch)
+
+    def flush(self, timeout=None):
+        """
+        Останавливает фоновый поток, дописав все события из очереди
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopped.set()
+        self._thread.join(timeout)
+        self._pid = None
+
+
+_audit_log = None
+_audit_lock = threading.Lock()
+
+
+def get_audit_log():
+    """
+    Журнал аудита или None, если AUDIT_SINK не задан
+    """
+    global _audit_log
+    if api_settings.AUDIT_SINK is None:
+        return None
+    if _audit_log is None:
+        with _audit_lock:
+            if _audit_log is None:
+                _audit_log = AuditLog(
+                    api_settings.AUDIT_SINK(),
+                    api_settings.AUDIT_QUEUE_SIZE,
+                    api_settings.AUDIT_QUEUE_POLICY,
+                    api_settings.AUDIT_BATCH_SIZE,
+                    api_settings.AUDIT_FLUSH_INTERVAL,
+                )
+                atexit.register(_audit_log.flush)
+    return _audit_log
+
+
+def audit(event, token=None, **fields):
+    """
+    Ставит событие в очередь журнала аудита. Данные токена (jti, пользователь, тип) берутся из payload
+    """
+    audit_log = get_audit_log()
+    if audit_log is None:
+        return
+    record = {'event': event, 'ts': time.time()}
+    if token is not None:
+        record['jti'] = token.get(api_settings.JTI_CLAIM)
+        record['user_id'] = token.get(api_settings.USER_ID_CLAIM)
+        record['token_type'] = token.get(api_settings.TOKEN_TYPE_CLAIM)
+    record.update(fields)
+    audit_log.record(record)
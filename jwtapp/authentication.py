@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
 from rest_framework import HTTP_HEADER_ENCODING, authentication
+from .audit import audit
 from .exceptions import AuthenticationFailed, InvalidToken, TokenError
+from .routers import pin_user
 from .settings import api_settings
+from .tokens import AccessToken, UntypedToken
 
 AUTH_HEADER_TYPES = api_settings.AUTH_HEADER_TYPES
 
@@ -30,7 +33,9 @@ class JWTAuthentication(authentication.BaseAuthentication):
         if raw_token is None:
             return None
         validated_token = self.get_validated_token(raw_token)
-        return self.get_user(validated_token), validated_token
+        user = self.get_user(validated_token)
+        self.renew_token(request, validated_token)
+        return user, validated_token
 
     def authenticate_header(self, request):
         return f'{AUTH_HEADER_TYPES[0]} realm="{self.www_authenticate_realm}"'
@@ -67,7 +72,7 @@ class JWTAuthentication(authentication.BaseAuthentication):
         Проверяет закодированный JWT и возвращает проверенный токен
         """
         messages = []
-        for AuthToken in api_settings.AUTH_TOKEN_CLASSES:
+        for AuthToken in self.get_token_classes(raw_token):
             try:
                 return AuthToken(raw_token)
             except TokenError as err:
@@ -79,6 +84,7 @@ class JWTAuthentication(authentication.BaseAuthentication):
                     }
                 )
 
+        audit('auth_failed', detail=messages)
         raise InvalidToken(
             {
                 'detail': 'Данный токен недействителен',
@@ -86,6 +92,37 @@ class JWTAuthentication(authentication.BaseAuthentication):
             }
         )
 
+    def get_token_classes(self, raw_token):
+        """
+        Классы из AUTH_TOKEN_CLASSES, которыми проверяется токен. При нескольких классах подходящий
+        выбирается по claim типа из payload без проверки подписи, и подпись проверяется один раз,
+        а не для каждого класса по очереди
+        """
+        classes = api_settings.AUTH_TOKEN_CLASSES
+        if len(classes) < 2 or api_settings.TOKEN_TYPE_CLAIM is None:
+            return classes
+        try:
+            token_type = UntypedToken(raw_token, verify=False).get(api_settings.TOKEN_TYPE_CLAIM)
+        except TokenError:
+            return classes
+        return [AuthToken for AuthToken in classes if AuthToken.token_type == token_type] or classes
+
+    def renew_token(self, request, validated_token):
+        """
+        Если access токен истекает в течение ACCESS_TOKEN_RENEW_WINDOW, выпускает новый.
+        AccessTokenRenewalMiddleware передаёт его клиенту в заголовке ACCESS_TOKEN_RENEW_HEADER
+        """
+        window = api_settings.ACCESS_TOKEN_RENEW_WINDOW
+        if window is None or not isinstance(validated_token, AccessToken):
+            return
+        if validated_token.expires_within(window):
+            try:
+                renewed = validated_token.renewed()
+            except TokenError:
+                # Текущий токен действует до своего "exp", дальше нужен вход или refresh
+                return
+            request._request.renewed_access_token = str(renewed)
+
     def get_user(self, validated_token):
         """
         Метод пытается вернуть пользователя используя проверенный токен
@@ -95,6 +132,8 @@ class JWTAuthentication(authentication.BaseAuthentication):
         except KeyError:
             raise InvalidToken('В токене не содержится идентификатора пользователя '
                                'который можно было бы распознать')
+        if api_settings.READ_REPLICA_DATABASE:
+            pin_user(user_id)
         try:
             user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
         except self.user_model.DoesNotExist:
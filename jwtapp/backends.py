@@ -1,9 +1,15 @@
 import json
+import warnings
 import jwt
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
 from datetime import timedelta
+from importlib.util import find_spec
 from typing import Optional, Type, Union
-from jwt import InvalidAlgorithmError, InvalidTokenError
+from jwt import InvalidAlgorithmError, InvalidKeyError, InvalidTokenError
+from jwt.algorithms import get_default_algorithms
 from .exceptions import TokenBackendError
+from .utils import epoch_now
 
 try:
     from jwt import PyJWKClient, PyJWKClientError
@@ -11,6 +17,58 @@ try:
 except ImportError:
     JWK_CLIENT_AVAILABLE = False
 
+# cbor2 импортируется только при первом использовании формата cwt
+CBOR_AVAILABLE = find_spec('cbor2') is not None
+# cryptography нужен для RS*, PS*, ES* и EdDSA; HS* работает без него
+CRYPTO_AVAILABLE = find_spec('cryptography') is not None
+
+TOKEN_FORMATS = ('jwt', 'compact', 'cwt')
+# Значение "typ" в заголовке JWT с сокращёнными claims
+COMPACT_JWT_TYPE = 'CJWT'
+
+# COSE (RFC 9052, RFC 9053): идентификаторы алгоритмов, заголовок alg, теги сообщений
+COSE_ALGORITHMS = {
+    'HS256': 5, 'HS384': 6, 'HS512': 7,
+    'ES256': -7, 'ES384': -35, 'ES512': -36, 'EdDSA': -8,
+    'RS256': -257, 'RS384': -258, 'RS512': -259,
+    'PS256': -37, 'PS384': -38, 'PS512': -39,
+}
+COSE_HEADER_ALG = 1
+COSE_MAC0_TAG = 17
+COSE_SIGN1_TAG = 18
+# Зарегистрированные claims CWT (RFC 8392); JTI передаётся как "cti" (7)
+CWT_CLAIM_KEYS = {'iss': 1, 'sub': 2, 'aud': 3, 'exp': 4, 'nbf': 5, 'iat': 6}
+CWT_CTI_KEY = 7
+
+
+def load_cbor():
+    if not CBOR_AVAILABLE:
+        raise TokenBackendError('Для формата cwt требуется пакет cbor2')
+    import cbor2
+    return cbor2
+
+
+def b64encode_nopad(value):
+    return urlsafe_b64encode(value).rstrip(b'=').decode('ascii')
+
+
+def b64decode_nopad(value):
+    if isinstance(value, str):
+        value = value.encode('ascii')
+    return urlsafe_b64decode(value + b'=' * (-len(value) % 4))
+
+
+def pack_jti(jti):
+    """
+    Hex JTI из 32 символов (uuid4().hex) упаковывается в 16 байт, остальные значения остаются как есть
+    """
+    if isinstance(jti, str) and len(jti) == 32:
+        try:
+            return bytes.fromhex(jti)
+        except ValueError:
+            pass
+    return jti
+
 
 class TokenBackend:
     def __init__(
@@ -23,6 +81,9 @@ class TokenBackend:
         jwk_url: str = None,
         leeway: Union[float, int, timedelta] = None,
         json_encoder: Optional[Type[json.JSONEncoder]] = None,
+        jti_claim: str = 'jti',
+        compact_claims: Optional[dict] = None,
+        key_id: Optional[str] = None,
     ):
 
         self.algorithm = algorithm
@@ -30,15 +91,32 @@ class TokenBackend:
         self.verifying_key = verifying_key
         self.audience = audience
         self.issuer = issuer
+        # kid в заголовке JWT: по нему сервисы выбирают ключ из опубликованного JWKS
+        self.key_id = key_id
 
-        if JWK_CLIENT_AVAILABLE:
-            self.jwks_client = PyJWKClient(jwk_url) if jwk_url else None
-        else:
-            self.jwks_client = None
+        # Клиент JWKS создаётся при первой проверке токена
+        self.jwk_url = jwk_url if JWK_CLIENT_AVAILABLE else None
+        self._jwks_client = None
 
         self.leeway = leeway
+        self.leeway_seconds = self.get_leeway().total_seconds()
         self.json_encoder = json_encoder
 
+        # Сокращённые имена claims для форматов compact и cwt: полное имя -> короткое
+        self.jti_claim = jti_claim
+        self.compact_claims = dict(compact_claims or {})
+        self.expanded_claims = {short: claim for claim, short in self.compact_claims.items()}
+        self.cwt_claim_keys = {**CWT_CLAIM_KEYS, jti_claim: CWT_CTI_KEY}
+        self.cwt_claim_names = {key: claim for claim, key in self.cwt_claim_keys.items()}
+        self._prepared_keys = {}
+        self._algorithm = None
+
+    @property
+    def jwks_client(self):
+        if self.jwk_url and self._jwks_client is None:
+            self._jwks_client = PyJWKClient(self.jwk_url)
+        return self._jwks_client
+
     def get_leeway(self) -> timedelta:
         if self.leeway is None:
             return timedelta(seconds=0)
@@ -50,43 +128,163 @@ class TokenBackend:
             raise TokenBackendError(f'Нераспознанный формат "{type(self.leeway)}", '
                                     f'"leeway" должен быть типом int, float или timedelta')
 
+    def get_algorithm(self):
+        """
+        Реализация алгоритма PyJWT
+        """
+        if self._algorithm is None:
+            try:
+                self._algorithm = get_default_algorithms()[self.algorithm]
+            except KeyError as ex:
+                if self.algorithm in COSE_ALGORITHMS and not CRYPTO_AVAILABLE:
+                    raise TokenBackendError(f'Для алгоритма {self.algorithm} требуется пакет cryptography') from ex
+                raise TokenBackendError('Неверный алгоритм') from ex
+        return self._algorithm
+
+    def get_prepared_key(self, signing):
+        """
+        Ключ подписи или проверки, разобранный алгоритмом PyJWT один раз (PEM ключи RS*/ES*/EdDSA не
+        разбираются заново на каждый токен). Без VERIFYING_KEY открытый ключ выводится из ключа подписи
+        """
+        if signing not in self._prepared_keys:
+            algorithm = self.get_algorithm()
+            if signing or self.algorithm.startswith('HS'):
+                key = self.signing_key
+            elif not self.verifying_key and self.signing_key:
+                key = self.get_prepared_key(signing=True).public_key()
+            else:
+                key = self.verifying_key
+            try:
+                self._prepared_keys[signing] = algorithm.prepare_key(key)
+            except (InvalidKeyError, TypeError, ValueError, AttributeError) as ex:
+                raise TokenBackendError('Неверный ключ для алгоритма') from ex
+        return self._prepared_keys[signing]
+
+    def validate_keys(self):
+        """
+        Проверяет ключи при запуске: алгоритм доступен, тип и кривая ключей подходят алгоритму,
+        ключ подписи закрытый, ключ проверки соответствует ключу подписи. Короткие ключи HMAC и RSA
+        дают предупреждение. Вызывает TokenBackendError
+        """
+        algorithm = self.get_algorithm()
+        symmetric = self.algorithm.startswith('HS')
+        signing_key = self.get_prepared_key(signing=True) if self.signing_key else None
+        if signing_key is not None and not symmetric and not hasattr(signing_key, 'sign'):
+            raise TokenBackendError('Для подписи нужен закрытый ключ')
+        if symmetric or not (self.verifying_key or signing_key is not None):
+            # Ключ проверки берётся из JWK_URL или не задан (сервис только выдаёт HS токены)
+            verifying_key = signing_key
+        else:
+            verifying_key = self.get_prepared_key(signing=False)
+
+        check_key_length = getattr(algorithm, 'check_key_length', None)
+        for key in {id(key): key for key in (signing_key, verifying_key) if key is not None}.values():
+            message = check_key_length(key) if check_key_length else None
+            if message:
+                warnings.warn(message, stacklevel=2)
+
+        if signing_key is not None and verifying_key is not None:
+            probe = b'jwtapp key check'
+            if not algorithm.verify(probe, verifying_key, algorithm.sign(probe, signing_key)):
+                raise TokenBackendError('Ключ проверки не соответствует ключу подписи')
+
+    def public_jwk(self, key_id=None):
+        """
+        Открытый ключ проверки в виде JWK для публикации в JWKS
+        """
+        if self.algorithm.startswith('HS'):
+            raise TokenBackendError('Ключ HMAC не публикуется в JWKS')
+        key = self.get_prepared_key(signing=False)
+        if hasattr(key, 'public_key'):
+            key = key.public_key()
+        jwk = self.get_algorithm().to_jwk(key, as_dict=True)
+        jwk.update({'use': 'sig', 'alg': self.algorithm})
+        key_id = key_id or self.key_id
+        if key_id:
+            jwk['kid'] = key_id
+        return jwk
+
     def get_verifying_key(self, token):
         if self.algorithm.startswith('HS'):
-            return self.signing_key
+            return self.get_prepared_key(signing=False)
         if self.jwks_client:
             try:
                 return self.jwks_client.get_signing_key_from_jwt(token).key
             except PyJWKClientError as ex:
                 raise TokenBackendError('Неправильный токен или срок его действия истёк') from ex
-        return self.verifying_key
+        return self.get_prepared_key(signing=False)
+
+    def compact_payload(self, payload, registered=None):
+        """
+        Заменяет имена claims на короткие и упаковывает JTI в байты.
+        registered - числовые ключи зарегистрированных claims для CWT
+        """
+        registered = registered or {}
+        compact = {}
+        for claim, value in payload.items():
+            if claim == self.jti_claim:
+                value = pack_jti(value)
+            compact[registered.get(claim, self.compact_claims.get(claim, claim))] = value
+        return compact
+
+    def expand_payload(self, compact, registered=None):
+        """
+        Обратное преобразование compact_payload
+        """
+        expanded_keys = {**self.expanded_claims, **(registered or {})}
+        payload = {}
+        for key, value in compact.items():
+            claim = expanded_keys.get(key, key)
+            if claim == self.jti_claim and isinstance(value, bytes):
+                value = value.hex()
+            payload[claim] = value
+        return payload
 
-    def encode(self, payload):
+    def encode(self, payload, token_format='jwt'):
         """
-        Возвращает закодированный токен
+        Возвращает закодированный токен в формате token_format: 'jwt', 'compact' (JWT с короткими
+        claims и JTI в base64) или 'cwt' (CBOR Web Token в COSE_Mac0/COSE_Sign1, base64url)
         """
+        if token_format not in TOKEN_FORMATS:
+            raise TokenBackendError(f'Неизвестный формат токена "{token_format}"')
         jwt_payload = payload.copy()
         if self.audience is not None:
             jwt_payload['aud'] = self.audience
         if self.issuer is not None:
             jwt_payload['iss'] = self.issuer
+        if token_format == 'cwt':
+            return self.encode_cwt(jwt_payload)
+
+        headers = {'kid': self.key_id} if self.key_id else None
+        if token_format == 'compact':
+            jwt_payload = self.compact_payload(jwt_payload)
+            jti = jwt_payload.get(self.jti_claim)
+            if isinstance(jti, bytes):
+                jwt_payload[self.jti_claim] = b64encode_nopad(jti)
+            headers = {**(headers or {}), 'typ': COMPACT_JWT_TYPE}
         token = jwt.encode(
             jwt_payload,
-            self.signing_key,
+            self.get_prepared_key(signing=True),
             algorithm=self.algorithm,
+            headers=headers,
             json_encoder=self.json_encoder,
         )
         if isinstance(token, bytes):
             return token.decode('utf-8')
         return token
 
-    def decode(self, token, verify=True):
+    def decode(self, token, verify=True, verify_exp=True):
         """
-        Выполняет проверку данного токена
+        Выполняет проверку данного токена. Формат (jwt, compact или cwt) определяется автоматически
         """
+        if isinstance(token, bytes):
+            token = token.decode('utf-8')
+        if '.' not in token:
+            return self.decode_cwt(token, verify=verify, verify_exp=verify_exp)
         try:
-            return jwt.decode(
+            decoded = jwt.decode_complete(
                 token,
-                self.get_verifying_key(token),
+                self.get_verifying_key(token) if verify else None,
                 algorithms=[self.algorithm],
                 audience=self.audience,
                 issuer=self.issuer,
@@ -94,9 +292,103 @@ class TokenBackend:
                 options={
                     'verify_aud': self.audience is not None,
                     'verify_signature': verify,
+                    # exp и iat сверяются с часами jwtapp.utils в verify_time_claims
+                    'verify_exp': False,
+                    'verify_iat': False,
                 },
             )
         except InvalidAlgorithmError as ex:
             raise TokenBackendError('Неверный алгоритм') from ex
         except InvalidTokenError as ex:
             raise TokenBackendError('Неправильный токен или срок его действия истёк') from ex
+
+        payload = decoded['payload']
+        if verify:
+            self.verify_time_claims(payload, verify_exp)
+        if decoded['header'].get('typ') != COMPACT_JWT_TYPE:
+            return payload
+        payload = self.expand_payload(payload)
+        jti = payload.get(self.jti_claim)
+        if isinstance(jti, str) and len(jti) == 22:
+            try:
+                payload[self.jti_claim] = b64decode_nopad(jti).hex()
+            except (Base64Error, ValueError):
+                pass
+        return payload
+
+    def cose_structure(self, protected, body):
+        """
+        Данные для подписи: MAC_structure для HMAC, Sig_structure для остальных алгоритмов.
+        CWT не использует JWK_URL
+        """
+        context = 'MAC0' if self.algorithm.startswith('HS') else 'Signature1'
+        return load_cbor().dumps([context, protected, b'', body])
+
+    def encode_cwt(self, payload):
+        cbor2 = load_cbor()
+        if self.algorithm not in COSE_ALGORITHMS:
+            raise TokenBackendError('Неверный алгоритм')
+        body = cbor2.dumps(self.compact_payload(payload, self.cwt_claim_keys))
+        protected = cbor2.dumps({COSE_HEADER_ALG: COSE_ALGORITHMS[self.algorithm]})
+        signature = self.get_algorithm().sign(
+            self.cose_structure(protected, body), self.get_prepared_key(signing=True),
+        )
+        tag = COSE_MAC0_TAG if self.algorithm.startswith('HS') else COSE_SIGN1_TAG
+        return b64encode_nopad(cbor2.dumps(cbor2.CBORTag(tag, [protected, {}, body, signature])))
+
+    def decode_cwt(self, token, verify=True, verify_exp=True):
+        cbor2 = load_cbor()
+        try:
+            message = cbor2.loads(b64decode_nopad(token))
+            if not isinstance(message, cbor2.CBORTag):
+                raise ValueError('COSE сообщение должно быть тегом CBOR')
+            protected, _, body, signature = message.value
+            if not all(isinstance(part, bytes) for part in (protected, body, signature)):
+                raise ValueError('Части COSE сообщения должны быть байтами')
+            header = cbor2.loads(protected)
+            claims = cbor2.loads(body)
+            if not isinstance(header, dict) or not isinstance(claims, dict):
+                raise ValueError('Заголовок и claims COSE сообщения должны быть словарями')
+        except (Base64Error, ValueError, TypeError, cbor2.CBORDecodeError) as ex:
+            raise TokenBackendError('Неправильный токен или срок его действия истёк') from ex
+
+        if verify:
+            tag = COSE_MAC0_TAG if self.algorithm.startswith('HS') else COSE_SIGN1_TAG
+            if message.tag != tag or header.get(COSE_HEADER_ALG) != COSE_ALGORITHMS.get(self.algorithm):
+                raise TokenBackendError('Неверный алгоритм')
+            if not self.get_algorithm().verify(
+                self.cose_structure(protected, body), self.get_prepared_key(signing=False), signature,
+            ):
+                raise TokenBackendError('Неправильный токен или срок его действия истёк')
+
+        payload = self.expand_payload(claims, self.cwt_claim_names)
+        if verify:
+            self.verify_cwt_claims(payload, verify_exp)
+        return payload
+
+    def verify_time_claims(self, payload, verify_exp):
+        """
+        Проверяет exp и iat по часам процесса (jwtapp.utils.epoch_now) с учётом leeway
+        """
+        now = epoch_now()
+        try:
+            if verify_exp and 'exp' in payload and int(payload['exp']) <= now - self.leeway_seconds:
+                raise TokenBackendError('Неправильный токен или срок его действия истёк')
+            if 'iat' in payload and int(payload['iat']) > now + self.leeway_seconds:
+                raise TokenBackendError('Неправильный токен или срок его действия истёк')
+        except (TypeError, ValueError, OverflowError):
+            raise TokenBackendError('Неправильный токен или срок его действия истёк')
+
+    def verify_cwt_claims(self, payload, verify_exp):
+        """
+        Проверки aud и iss, которые для JWT выполняет PyJWT, и проверки exp и iat
+        """
+        self.verify_time_claims(payload, verify_exp)
+        if self.audience is not None:
+            audience = payload.get('aud')
+            audience = [audience] if isinstance(audience, str) else audience or []
+            expected = [self.audience] if isinstance(self.audience, str) else self.audience
+            if not any(aud in audience for aud in expected):
+                raise TokenBackendError('Неправильный токен или срок его действия истёк')
+        if self.issuer is not None and payload.get('iss') != self.issuer:
+            raise TokenBackendError('Неправильный токен или срок его действия истёк')
@@ -0,0 +1,237 @@
+import threading
+import time
+from django.conf import settings
+from django.db import DatabaseError, connections, models, router
+from django.db.models.signals import post_save
+from .routers import remember_user_write
+from .settings import api_settings
+from .tokens_models.models import BlacklistedToken, OutstandingToken, OutstandingTokenQuerySet
+from .utils import aware_utcnow, datetime_from_epoch
+
+# Список периодов для списка сессий перечитывается не реже, чем раз в столько секунд
+BUCKET_LIST_TTL = 60
+
+_bucket_models = {}
+_existing_tables = set()
+_bucket_lists = {}
+_lock = threading.Lock()
+
+
+def bucket_period():
+    """
+    Длина периода в секундах (TOKEN_BUCKET_PERIOD) или None, если хранение по периодам выключено
+    """
+    period = api_settings.TOKEN_BUCKET_PERIOD
+    if not period:
+        return None
+    return int(period.total_seconds() if hasattr(period, 'total_seconds') else period)
+
+
+def bucket_for(exp):
+    return int(exp) // bucket_period()
+
+
+def bucket_bounds(number):
+    """
+    Границы периода [начало, конец) по expires_at
+    """
+    period = bucket_period()
+    return datetime_from_epoch(number * period), datetime_from_epoch((number + 1) * period)
+
+
+def build_bucket_models(number):
+    """
+    Модели таблиц одного периода с теми же полями, что OutstandingToken и BlacklistedToken.
+    Не попадают в миграции (managed = False), таблицы создаются при первой записи.
+    Это обычные таблицы, а не партиции PostgreSQL: партиция требует ключа партиционирования
+    в первичном ключе и уникальных индексах, и уникальность jti не была бы общей для всех периодов
+    """
+
+    def meta(model):
+        return type('Meta', (), {
+            'app_label': model._meta.app_label,
+            'db_table': f'{model._meta.db_table}_{number}',
+            'managed': False,
+        })
+
+    outstanding = type(f'OutstandingTokenBucket{number}', (models.Model,), {
+        '__module__': OutstandingToken.__module__,
+        'Meta': meta(OutstandingToken),
+        'bucket': number,
+        # Автоинкремент в каждой таблице: уникальность id обеспечивает БД, а не процессы.
+        # Между таблицами id повторяются, порядок задаёт пара (номер периода, id)
+        'id': models.BigAutoField(primary_key=True),
+        'user': models.ForeignKey(
+            settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, null=True, blank=True,
+            db_constraint=False, related_name='+',
+        ),
+        'jti': models.CharField(unique=True, max_length=255),
+        'token': models.TextField(),
+        'created_at': models.DateTimeField(null=True, blank=True),
+        'expires_at': models.DateTimeField(),
+        'objects': OutstandingTokenQuerySet.as_manager(),
+    })
+    blacklisted = type(f'BlacklistedTokenBucket{number}', (models.Model,), {
+        '__module__': BlacklistedToken.__module__,
+        'Meta': meta(BlacklistedToken),
+        'bucket': number,
+        # Ключ - сам токен: запись вставляется и через INSERT ... SELECT в OutstandingTokenQuerySet.blacklist
+        'token': models.OneToOneField(
+            outstanding, on_delete=models.CASCADE, primary_key=True, related_name='blacklistedtoken',
+        ),
+        'blacklisted_at': models.DateTimeField(auto_now_add=True, db_index=True),
+    })
+    return outstanding, blacklisted
+
+
+def get_bucket_models(number):
+    if number not in _bucket_models:
+        with _lock:
+            if number not in _bucket_models:
+                pair = build_bucket_models(number)
+                for model in pair:
+                    post_save.connect(remember_user_write, sender=model, dispatch_uid=f'jwtapp_remember_write_{model}')
+                _bucket_models[number] = pair
+    return _bucket_models[number]
+
+
+def table_exists(connection, table):
+    """
+    Есть ли таблица в БД: один запрос к каталогу по имени вместо полного списка таблиц
+    """
+    if connection.vendor == 'postgresql':
+        sql, params = 'SELECT to_regclass(%s) IS NOT NULL', [connection.ops.quote_name(table)]
+    elif connection.vendor == 'sqlite':
+        sql, params = "SELECT EXISTS (SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s)", [table]
+    elif connection.vendor == 'mysql':
+        sql = (
+            'SELECT EXISTS (SELECT 1 FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s)'
+        )
+        params = [table]
+    else:
+        return table in connection.introspection.table_names()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return bool(cursor.fetchone()[0])
+
+
+def ensure_bucket_tables(number, db):
+    """
+    Возвращает модели периода, создавая его таблицы в БД db при необходимости
+    """
+    outstanding, blacklisted = get_bucket_models(number)
+    if (db, number) in _existing_tables:
+        return outstanding, blacklisted
+    with _lock:
+        if (db, number) not in _existing_tables:
+            connection = connections[db]
+            for model in (outstanding, blacklisted):
+                if table_exists(connection, model._meta.db_table):
+                    continue
+                try:
+                    with connection.schema_editor() as editor:
+                        editor.create_model(model)
+                except DatabaseError:
+                    # Таблицу мог одновременно создать другой процесс
+                    if not table_exists(connection, model._meta.db_table):
+                        raise
+            _existing_tables.add((db, number))
+            _bucket_lists.pop(db, None)
+    return outstanding, blacklisted
+
+
+def bucket_exists(number, db):
+    """
+    Есть ли таблицы периода в БД db. Отсутствие не кешируется: таблицу мог только что создать
+    другой процесс, и отозванный в ней токен должен отклоняться сразу. Поэтому проверка - один
+    запрос к каталогу только по этой таблице
+    """
+    if (db, number) in _existing_tables:
+        return True
+    outstanding, _ = get_bucket_models(number)
+    if table_exists(connections[db], outstanding._meta.db_table):
+        _existing_tables.add((db, number))
+        _bucket_lists.pop(db, None)
+        return True
+    return False
+
+
+def existing_buckets(db, cached=False):
+    """
+    Номера периодов, таблицы которых есть в БД db. При cached=True список берётся из кеша процесса
+    (не старше BUCKET_LIST_TTL секунд, сбрасывается при создании и удалении таблиц периода)
+    """
+    if cached:
+        entry = _bucket_lists.get(db)
+        if entry is not None and time.monotonic() - entry[0] < BUCKET_LIST_TTL:
+            return entry[1]
+    prefix = f'{OutstandingToken._meta.db_table}_'
+    numbers = set()
+    for table in connections[db].introspection.table_names():
+        suffix = table[len(prefix):]
+        if table.startswith(prefix) and suffix.isdigit():
+            numbers.add(int(suffix))
+    numbers = sorted(numbers)
+    _bucket_lists[db] = (time.monotonic(), numbers)
+    return numbers
+
+
+def token_models_for_payload(payload, db):
+    """
+    Модели, в которые записывается токен: таблицы его периода по "exp" или основные таблицы
+    """
+    if bucket_period() is None or 'exp' not in payload:
+        return OutstandingToken, BlacklistedToken
+    return ensure_bucket_tables(bucket_for(payload['exp']), db or router.db_for_write(OutstandingToken))
+
+
+def token_model_pairs_for_payload(payload, db):
+    """
+    Модели, в которых может находиться токен: таблицы его периода, если они есть, и основные таблицы
+    с токенами, записанными до включения TOKEN_BUCKET_PERIOD
+    """
+    pairs = [(OutstandingToken, BlacklistedToken)]
+    if bucket_period() is not None and 'exp' in payload:
+        number = bucket_for(payload['exp'])
+        if bucket_exists(number, db or router.db_for_write(OutstandingToken)):
+            pairs.insert(0, get_bucket_models(number))
+    return pairs
+
+
+def token_model_pairs(db, now=None, cached=False):
+    """
+    Основные модели и модели всех существующих периодов в БД db.
+    При заданном now - только периоды, в которых остались неистёкшие токены, cached - как в existing_buckets
+    """
+    pairs = [(OutstandingToken, BlacklistedToken)]
+    if bucket_period() is None:
+        return pairs
+    for number in existing_buckets(db or router.db_for_write(OutstandingToken), cached):
+        if now is not None and bucket_bounds(number)[1] <= now:
+            continue
+        pairs.append(get_bucket_models(number))
+    return pairs
+
+
+def drop_expired_buckets(db, now=None):
+    """
+    Удаляет таблицы периодов, все токены которых истекли. Возвращает число удалённых периодов
+    """
+    if bucket_period() is None:
+        return 0
+    if now is None:
+        now = aware_utcnow()
+    db = db or router.db_for_write(OutstandingToken)
+    dropped = 0
+    for number in existing_buckets(db):
+        if bucket_bounds(number)[1] > now:
+            continue
+        outstanding, blacklisted = get_bucket_models(number)
+        with connections[db].schema_editor() as editor:
+            editor.delete_model(blacklisted)
+            editor.delete_model(outstanding)
+        _existing_tables.discard((db, number))
+        _bucket_lists.pop(db, None)
+        dropped += 1
+    return dropped
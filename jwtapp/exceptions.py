@@ -31,6 +31,17 @@ class AuthenticationFailed(DetailDictMixin, exceptions.AuthenticationFailed):
     pass
 
 
+class ServiceUnavailable(exceptions.APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервер перегружен, повторите запрос позже'
+    default_code = 'service_unavailable'
+
+    def __init__(self, detail=None, code=None, wait=1):
+        super().__init__(detail, code)
+        # Передаётся клиенту в заголовке Retry-After
+        self.wait = wait
+
+
 class InvalidToken(AuthenticationFailed):
     status_code = status.HTTP_401_UNAUTHORIZED
     default_detail = 'Неправильный токен или срок его действия истёк'
@@ -0,0 +1,44 @@
+import json
+from functools import lru_cache
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+from .settings import api_settings
+
+
+@lru_cache(maxsize=None)
+def load_hash_params(path):
+    with open(path, encoding='utf-8') as params:
+        return json.load(params)
+
+
+def get_hash_params(algorithm):
+    """
+    Параметры алгоритма из PASSWORD_HASH_PARAMS: словарь {алгоритм: {параметр: значение}}
+    или путь к JSON файлу, записанному командой calibratehashers
+    """
+    params = api_settings.PASSWORD_HASH_PARAMS or {}
+    if not isinstance(params, dict):
+        params = load_hash_params(str(params))
+    return params.get(algorithm, {})
+
+
+def tuned_param(base, name):
+    default = getattr(base, name)
+    return property(lambda self: get_hash_params(self.algorithm).get(name, default))
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = tuned_param(PBKDF2PasswordHasher, 'iterations')
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    rounds = tuned_param(BCryptSHA256PasswordHasher, 'rounds')
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    time_cost = tuned_param(Argon2PasswordHasher, 'time_cost')
+    memory_cost = tuned_param(Argon2PasswordHasher, 'memory_cost')
+    parallelism = tuned_param(Argon2PasswordHasher, 'parallelism')
@@ -0,0 +1,73 @@
+import json
+import secrets
+from hashlib import sha256
+from .backends import CRYPTO_AVAILABLE, b64encode_nopad
+from .exceptions import TokenBackendError
+
+HMAC_ALGORITHMS = ('HS256', 'HS384', 'HS512')
+ASYMMETRIC_ALGORITHMS = (
+    'RS256', 'RS384', 'RS512',
+    'PS256', 'PS384', 'PS512',
+    'ES256', 'ES384', 'ES512',
+    'EdDSA',
+)
+# Поля открытого ключа для отпечатка JWK (RFC 7638)
+THUMBPRINT_MEMBERS = {
+    'EC': ('crv', 'kty', 'x', 'y'),
+    'OKP': ('crv', 'kty', 'x'),
+    'RSA': ('e', 'kty', 'n'),
+}
+
+
+def generate_private_key(algorithm, rsa_bits=2048):
+    """
+    Новый закрытый ключ cryptography для алгоритма: Ed25519 для EdDSA, P-256/P-384/P-521 для ES*, RSA для RS*/PS*
+    """
+    if not CRYPTO_AVAILABLE:
+        raise TokenBackendError(f'Для алгоритма {algorithm} требуется пакет cryptography')
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+    if algorithm == 'EdDSA':
+        return ed25519.Ed25519PrivateKey.generate()
+    curves = {'ES256': ec.SECP256R1, 'ES384': ec.SECP384R1, 'ES512': ec.SECP521R1}
+    if algorithm in curves:
+        return ec.generate_private_key(curves[algorithm]())
+    if algorithm in ASYMMETRIC_ALGORITHMS:
+        return rsa.generate_private_key(public_exponent=65537, key_size=rsa_bits)
+    raise TokenBackendError(f'Для алгоритма {algorithm} нет пары ключей')
+
+
+def generate_key_pair(algorithm, rsa_bits=2048):
+    """
+    Возвращает (закрытый ключ PKCS8 PEM, открытый ключ PEM) строками
+    """
+    from cryptography.hazmat.primitives import serialization
+
+    private_key = generate_private_key(algorithm, rsa_bits)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return private_pem.decode('ascii'), public_pem.decode('ascii')
+
+
+def generate_secret(algorithm):
+    """
+    Случайный ключ HMAC длиной в размер хеша алгоритма (RFC 7518, 3.2)
+    """
+    return secrets.token_urlsafe(int(algorithm[2:]) // 8)
+
+
+def jwk_thumbprint(jwk):
+    """
+    Отпечаток JWK по RFC 7638, используется как kid
+    """
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk['kty']]}
+    canonical = json.dumps(members, separators=(',', ':'), sort_keys=True)
+    return b64encode_nopad(sha256(canonical.encode('utf-8')).digest())
+
+
+def jwks_document(keys):
+    return {'keys': list(keys)}
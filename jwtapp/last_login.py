@@ -0,0 +1,125 @@
+import atexit
+import logging
+import os
+import threading
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.db import close_old_connections
+from django.utils import timezone
+from .settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginUpdater:
+    """
+    Накапливает время последнего входа по пользователям (хранится только последнее значение)
+    и записывает их одним bulk_update не реже чем раз в flush_interval секунд.
+    Неудачная пачка возвращается в очередь, пока в ней меньше max_pending записей, остальное отбрасывается.
+    При заполненной очереди время входа записывается сразу в потоке запроса
+    """
+
+    def __init__(self, flush_interval, max_pending, batch_size=1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._thread = None
+
+    def ensure_started(self):
+        # После fork поток не наследуется: запускаем новый в каждом процессе, а также если поток завершился
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self.pending = {}
+            self._thread = threading.Thread(target=self.run, name='jwtapp-last-login', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def add(self, user):
+        self.ensure_started()
+        with self._lock:
+            full = user.pk not in self.pending and len(self.pending) >= self.max_pending
+            if not full:
+                self.pending[user.pk] = user.last_login
+            overflow = len(self.pending) >= self.max_pending
+        if overflow:
+            self._wakeup.set()
+        if full:
+            # Поток не успевает (или БД недоступна): очередь не растёт сверх max_pending
+            get_user_model().objects.filter(pk=user.pk).update(last_login=user.last_login)
+
+    def run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать last_login')
+
+    def flush(self):
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        user_model = get_user_model()
+        users = [user_model(pk=pk, last_login=last_login) for pk, last_login in pending.items()]
+        try:
+            user_model.objects.bulk_update(users, ['last_login'], batch_size=self.batch_size)
+        except Exception:
+            self.requeue(pending)
+            raise
+        finally:
+            close_old_connections()
+
+    def requeue(self, failed):
+        """
+        Возвращает неудачную пачку в очередь, не перезаписывая более новые значения и не превышая max_pending
+        """
+        with self._lock:
+            dropped = 0
+            for pk, last_login in failed.items():
+                if pk in self.pending:
+                    continue
+                if len(self.pending) >= self.max_pending:
+                    dropped += 1
+                    continue
+                self.pending[pk] = last_login
+        if dropped:
+            logger.warning('Отброшено %d значений last_login: очередь заполнена', dropped)
+
+
+_updater = None
+_updater_lock = threading.Lock()
+
+
+def get_last_login_updater():
+    global _updater
+    if _updater is None:
+        with _updater_lock:
+            if _updater is None:
+                _updater = LastLoginUpdater(
+                    api_settings.LAST_LOGIN_FLUSH_INTERVAL,
+                    api_settings.LAST_LOGIN_MAX_PENDING,
+                )
+                atexit.register(_updater.flush)
+    return _updater
+
+
+def record_last_login(user):
+    """
+    Обновляет время последнего входа: сразу, если LAST_LOGIN_FLUSH_INTERVAL не задан,
+    иначе отложенно и пачкой, с задержкой не больше LAST_LOGIN_FLUSH_INTERVAL секунд
+    """
+    if not api_settings.LAST_LOGIN_FLUSH_INTERVAL:
+        update_last_login(None, user)
+        return
+    user.last_login = timezone.now()
+    get_last_login_updater().add(user)
@@ -0,0 +1,17 @@
+from .settings import api_settings
+
+
+class AccessTokenRenewalMiddleware:
+    """
+    Добавляет в ответ новый access токен, выпущенный JWTAuthentication перед истечением текущего
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        renewed = getattr(request, 'renewed_access_token', None)
+        if renewed is not None:
+            response[api_settings.ACCESS_TOKEN_RENEW_HEADER] = renewed
+        return response
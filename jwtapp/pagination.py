@@ -0,0 +1,71 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class SessionCursorPagination(CursorPagination):
+    """
+    Постраничный вывод сессий по курсору (keyset по id), без OFFSET и COUNT(*)
+    """
+    ordering = '-id'
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+
+
+class BucketSessionCursorPagination(SessionCursorPagination):
+    """
+    Курсор по нескольким таблицам (основной и таблицам периодов TOKEN_BUCKET_PERIOD). У каждой таблицы
+    свой автоинкремент, поэтому порядок - по убыванию пары (номер периода, id), номер основной таблицы -1.
+    Таблицы читаются от новых периодов к старым, пока не наберётся страница. Только вперёд:
+    ссылка previous не выдаётся
+    """
+    main_table = -1
+
+    def paginate_querysets(self, querysets, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        position = self.decode_position(self.cursor)
+
+        numbered = sorted(
+            ((getattr(queryset.model, 'bucket', self.main_table), queryset) for queryset in querysets),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        rows = []
+        for number, queryset in numbered:
+            if position is not None:
+                last_number, last_id = position
+                if number > last_number:
+                    continue
+                if number == last_number:
+                    queryset = queryset.filter(id__lt=last_id)
+            limit = self.page_size + 1 - len(rows)
+            rows.extend((number, item) for item in queryset.order_by('-id')[:limit])
+            if len(rows) > self.page_size:
+                break
+
+        self.has_next = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        self.next_position = f'{page[-1][0]}:{page[-1][1].id}' if self.has_next else None
+        return [item for _, item in page]
+
+    def decode_position(self, cursor):
+        if cursor is None:
+            return None
+        try:
+            if cursor.reverse or cursor.position is None:
+                raise ValueError
+            last_number, last_id = cursor.position.split(':')
+            return int(last_number), int(last_id)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        return None
@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import timedelta
+from .buckets import token_model_pairs
+from .settings import api_settings
+from .sharding import token_databases
+from .tokens_models.models import BlacklistedToken
+from .utils import aware_utcnow, datetime_to_epoch
+
+# Как часто удалять из локального списка JTI с истёкшим сроком, секунд
+PRUNE_INTERVAL = 60
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+class RevocationFeed:
+    """
+    Локальная копия черного списка процесса: JTI -> "exp" токена.
+    Раз в interval секунд дочитывает записи BlacklistedToken новее водяного знака (blacklisted_at
+    с запасом overlap на транзакции, закоммиченные не по порядку). Если изменений больше max_batch,
+    список загружается заново целиком
+    """
+
+    def __init__(self, interval, max_batch, overlap):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.overlap = timedelta(seconds=overlap)
+        self._revoked = {}
+        self._watermarks = {}
+        self._next_poll = 0
+        self._next_prune = 0
+        self._lock = threading.Lock()
+        self.counters = {'polls': 0, 'resyncs': 0, 'applied': 0, 'errors': 0}
+        self.last_poll_at = None
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def is_revoked(self, jti):
+        """
+        True/False по локальной копии или None, если копия ещё ни разу не загружена (например, БД недоступна)
+        """
+        self.maybe_poll()
+        if not self._watermarks:
+            return None
+        return jti in self._revoked
+
+    def add(self, jti, exp):
+        """
+        Токен, отозванный в этом процессе, виден сразу, без ожидания следующего опроса
+        """
+        self._revoked[jti] = exp
+
+    def maybe_poll(self):
+        if time.monotonic() < self._next_poll or not self._lock.acquire(blocking=False):
+            # Опрос уже выполняет другой поток: отвечаем по текущей копии
+            return
+        try:
+            self.poll()
+        except Exception:
+            self.counters['errors'] += 1
+        finally:
+            self._next_poll = time.monotonic() + self.interval
+            self._lock.release()
+
+    def sources(self, now):
+        for db in token_databases(BlacklistedToken):
+            for _, blacklisted_model in token_model_pairs(db, now):
+                yield db, blacklisted_model
+
+    def poll(self):
+        now = aware_utcnow()
+        if not self._watermarks:
+            self.resync(now)
+            return
+        updates = {}
+        watermarks = {}
+        for db, model in self.sources(now):
+            key = (db, model._meta.db_table)
+            since = self._watermarks.get(key)
+            queryset = model.objects.using(db).order_by('blacklisted_at')
+            if since is not None:
+                queryset = queryset.filter(blacklisted_at__gte=since - self.overlap)
+            rows = list(queryset.values_list('token__jti', 'token__expires_at', 'blacklisted_at')[:self.max_batch + 1])
+            if len(rows) > self.max_batch:
+                # Отстали слишком сильно: дешевле загрузить список заново
+                self.resync(now)
+                return
+            watermarks[key] = rows[-1][2] if rows else since or now
+            updates.update((jti, (expires_at, blacklisted_at)) for jti, expires_at, blacklisted_at in rows)
+
+        lag = 0.0
+        for jti, (expires_at, blacklisted_at) in updates.items():
+            if jti not in self._revoked:
+                self._revoked[jti] = datetime_to_epoch(expires_at)
+                self.counters['applied'] += 1
+                lag = max(lag, (now - blacklisted_at).total_seconds())
+        self._watermarks.update(watermarks)
+        self.record_poll(now, lag)
+        self.prune(now)
+
+    def resync(self, now):
+        revoked = {}
+        watermarks = {}
+        for db, model in self.sources(now):
+            queryset = model.objects.using(db).filter(token__expires_at__gt=now).order_by()
+            for jti, expires_at in queryset.values_list('token__jti', 'token__expires_at').iterator(chunk_size=5000):
+                revoked[jti] = datetime_to_epoch(expires_at)
+            watermarks[(db, model._meta.db_table)] = now
+        self._revoked = revoked
+        self._watermarks = watermarks
+        self.counters['resyncs'] += 1
+        self.record_poll(now, 0.0)
+
+    def record_poll(self, now, lag):
+        self.counters['polls'] += 1
+        self.last_poll_at = now
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+
+    def prune(self, now):
+        if time.monotonic() < self._next_prune:
+            return
+        epoch = datetime_to_epoch(now)
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > epoch}
+        self._next_prune = time.monotonic() + PRUNE_INTERVAL
+
+    def metrics(self):
+        """
+        Размер локального списка, счётчики, задержка распространения отзыва (от blacklisted_at
+        до применения в этом процессе) и возраст последнего опроса в секундах
+        """
+        age = None
+        if self.last_poll_at is not None:
+            age = (aware_utcnow() - self.last_poll_at).total_seconds()
+        return {
+            **self.counters,
+            'size': len(self._revoked),
+            'last_lag_seconds': self.last_lag,
+            'max_lag_seconds': self.max_lag,
+            'poll_age_seconds': age,
+        }
+
+
+def get_revocation_feed():
+    """
+    Локальный черный список процесса или None, если REVOCATION_FEED_INTERVAL не задан
+    """
+    global _feed
+    interval = api_settings.REVOCATION_FEED_INTERVAL
+    if not interval:
+        return None
+    config = (interval, api_settings.REVOCATION_FEED_MAX_BATCH, api_settings.REVOCATION_FEED_OVERLAP)
+    if _feed is None or (_feed.interval, _feed.max_batch, _feed.overlap.total_seconds()) != config:
+        with _feed_lock:
+            if _feed is None or (_feed.interval, _feed.max_batch, _feed.overlap.total_seconds()) != config:
+                _feed = RevocationFeed(*config)
+    return _feed
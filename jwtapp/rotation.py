@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from django.core.cache import caches
+from .settings import api_settings
+
+LOCK_STRIPES = 64
+
+
+class RotationResultCache:
+    """
+    Результаты ротации refresh токенов по JTI старого токена: ограниченный по размеру LRU
+    с временем жизни записи. При заданном alias результаты хранятся в кэше Django (общем для воркеров)
+    """
+
+    def __init__(self, ttl, max_size, alias=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.alias = alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def key_lock(self, jti):
+        """
+        Блокировка для одновременных ротаций одного токена внутри процесса
+        """
+        return self._key_locks[hash(jti) % LOCK_STRIPES]
+
+    def get(self, jti, digest):
+        if self.alias is not None:
+            entry = caches[self.alias].get(f'jwtapp:rotation:{jti}')
+        else:
+            with self._lock:
+                entry = self._entries.get(jti)
+                if entry is not None and entry[0] <= time.monotonic():
+                    del self._entries[jti]
+                    entry = None
+            entry = entry and entry[1:]
+        if entry is None or entry[0] != digest:
+            return None
+        return dict(entry[1])
+
+    def set(self, jti, digest, data):
+        if self.alias is not None:
+            caches[self.alias].set(f'jwtapp:rotation:{jti}', (digest, data), timeout=self.ttl)
+            return
+        with self._lock:
+            self._entries[jti] = (time.monotonic() + self.ttl, digest, dict(data))
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+_cache = None
+
+
+def get_rotation_cache():
+    """
+    Кэш результатов ротации или None, если ROTATION_GRACE_PERIOD не задан
+    """
+    global _cache
+    period = api_settings.ROTATION_GRACE_PERIOD
+    if not period:
+        return None
+    ttl = period.total_seconds() if hasattr(period, 'total_seconds') else period
+    alias = api_settings.ROTATION_CACHE_ALIAS
+    max_size = api_settings.ROTATION_CACHE_MAX_SIZE
+    if _cache is None or (_cache.ttl, _cache.max_size, _cache.alias) != (ttl, max_size, alias):
+        _cache = RotationResultCache(ttl, max_size, alias)
+    return _cache
+
+
+def token_digest(raw_token):
+    return sha256(raw_token.encode()).hexdigest()
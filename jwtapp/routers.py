@@ -0,0 +1,182 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, router
+from .settings import api_settings
+from .sharding import get_shards
+
+_force_primary = ContextVar('jwtapp_force_primary', default=False)
+# Закрепление чтений за основной БД действует в пределах текущего запроса
+_pinned_until = ContextVar('jwtapp_pinned_until', default=0.0)
+# Пользователи с недавней записью: их следующие запросы тоже читают из основной БД
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+RECENT_WRITES_MAX_SIZE = 10000
+
+
+def pin_primary(seconds=None, user_id=None):
+    """
+    Направляет чтения текущего запроса в основную БД на заданное время (read-your-writes).
+    С user_id закрепление действует и для следующих запросов этого пользователя (pin_user)
+    """
+    if seconds is None:
+        seconds = api_settings.READ_REPLICA_PIN_SECONDS
+    deadline = time.monotonic() + seconds
+    _pinned_until.set(max(_pinned_until.get(), deadline))
+    if user_id is None:
+        return
+    with _recent_writes_lock:
+        if len(_recent_writes) >= RECENT_WRITES_MAX_SIZE:
+            now = time.monotonic()
+            for key in [key for key, until in _recent_writes.items() if until <= now]:
+                del _recent_writes[key]
+            if len(_recent_writes) >= RECENT_WRITES_MAX_SIZE:
+                _recent_writes.clear()
+        _recent_writes[str(user_id)] = deadline
+
+
+def pin_user(user_id):
+    """
+    Закрепляет чтения текущего запроса за основной БД, если пользователь недавно записывал данные.
+    Вызывается при аутентификации до загрузки пользователя
+    """
+    deadline = _recent_writes.get(str(user_id))
+    if deadline is not None and deadline > time.monotonic():
+        _pinned_until.set(max(_pinned_until.get(), deadline))
+
+
+def reset_pin(**kwargs):
+    _pinned_until.set(0.0)
+
+
+request_started.connect(reset_pin, dispatch_uid='jwtapp_reset_replica_pin')
+
+
+@contextmanager
+def use_primary():
+    """
+    Все чтения внутри блока выполняются в основной БД
+    """
+    reset_token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(reset_token)
+
+
+def pin_token_user(payload):
+    """
+    pin_user для пользователя из claims токена: проверки отзыва токена видят запись,
+    сделанную его пользователем в недавнем запросе
+    """
+    if api_settings.READ_REPLICA_DATABASE:
+        user_id = payload.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None:
+            pin_user(user_id)
+
+
+def written_user_id(instance):
+    """
+    Идентификатор пользователя (USER_ID_FIELD) записываемого пользователя, токена, записи черного списка
+    или завершения сессий
+    """
+    if instance is None:
+        return None
+    if instance._meta.label_lower == settings.AUTH_USER_MODEL.lower():
+        return getattr(instance, api_settings.USER_ID_FIELD, None)
+    if instance._meta.model_name == 'sessioncutoff':
+        return instance.user_id
+    if api_settings.USER_ID_FIELD not in ('id', 'pk'):
+        return None
+    if hasattr(instance, 'token_id'):
+        # Запись черного списка: пользователь её токена
+        return instance.token.user_id
+    return getattr(instance, 'user_id', None)
+
+
+def remember_user_write(sender, instance, **kwargs):
+    """
+    post_save пользователя, OutstandingToken, BlacklistedToken и SessionCutoff: следующие запросы
+    пользователя читают из основной БД.
+    В db_for_write идентификатор недоступен (create() не передаёт объект, у нового объекта нет pk)
+    """
+    if api_settings.READ_REPLICA_DATABASE:
+        remember_user_ids([written_user_id(instance)])
+
+
+def remember_user_ids(user_ids):
+    """
+    Закрепление за основной БД для пользователей, чьи токены изменены без post_save (запросы по выборке).
+    user_ids - значения USER_ID_FIELD
+    """
+    if api_settings.READ_REPLICA_DATABASE:
+        for user_id in set(user_ids):
+            if user_id is not None:
+                pin_primary(user_id=user_id)
+
+
+class AuthReadReplicaRouter:
+    """
+    Направляет чтения токенов и пользователей на реплику (READ_REPLICA_DATABASE), запись - в основную БД.
+    После записи этих моделей чтения до конца запроса (не дольше READ_REPLICA_PIN_SECONDS) и запросы
+    того же пользователя в течение READ_REPLICA_PIN_SECONDS идут в основную БД
+    """
+    route_app_labels = ('tokens_models',)
+
+    def is_auth_model(self, model):
+        return (
+            model._meta.app_label in self.route_app_labels
+            or model._meta.label_lower == settings.AUTH_USER_MODEL.lower()
+        )
+
+    def db_for_read(self, model, **hints):
+        replica = api_settings.READ_REPLICA_DATABASE
+        if not replica or not self.is_auth_model(model):
+            return None
+        if _force_primary.get() or time.monotonic() < _pinned_until.get():
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if api_settings.READ_REPLICA_DATABASE and self.is_auth_model(model):
+            pin_primary()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        replica = api_settings.READ_REPLICA_DATABASE
+        if replica and {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, replica}:
+            return True
+        return None
+
+
+class TokenShardRouter:
+    """
+    При шардировании токенов (TOKEN_SHARDS) связанные с токеном объекты других моделей,
+    например пользователь, читаются не из шарда токена, а по общим правилам маршрутизации
+    """
+    token_app_label = 'tokens_models'
+
+    def is_sharded_token(self, instance):
+        return (
+            instance is not None
+            and instance._meta.app_label == self.token_app_label
+            and instance._state.db in get_shards()
+        )
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != self.token_app_label and self.is_sharded_token(hints.get('instance')):
+            return router.db_for_read(model)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != self.token_app_label and self.is_sharded_token(hints.get('instance')):
+            return router.db_for_write(model)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self.is_sharded_token(obj1) or self.is_sharded_token(obj2):
+            return True
+        return None
@@ -1,8 +1,11 @@
 from django.contrib.auth import authenticate, get_user_model
-from django.contrib.auth.models import update_last_login
 from rest_framework import exceptions, serializers
+from .audit import audit, get_audit_log
+from .last_login import record_last_login
+from .rotation import get_rotation_cache, token_digest
 from .settings import api_settings
-from .tokens import RefreshToken
+from .tokens import RefreshToken, SlidingToken
+from .tokens_models.models import OutstandingToken
 
 
 class PasswordField(serializers.CharField):
@@ -67,11 +70,54 @@ class TokenObtainPairSerializer(TokenObtainSerializer):
         data['refresh'] = str(refresh)
         data['access'] = str(refresh.access_token)
         if api_settings.UPDATE_LAST_LOGIN:
-            update_last_login(None, self.user)
+            record_last_login(self.user)
         return data
 
 
-class TokenRefreshSerializer(serializers.Serializer):
+class TokenObtainSlidingSerializer(TokenObtainSerializer):
+    """
+    Получение sliding токена
+    """
+    token_class = SlidingToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        token = self.get_token(self.user)
+        data['token'] = str(token)
+        if api_settings.UPDATE_LAST_LOGIN:
+            record_last_login(self.user)
+        return data
+
+
+class RotationGraceMixin:
+    """
+    Повторная ротация того же refresh токена в течение ROTATION_GRACE_PERIOD
+    возвращает ранее выданную пару без подписи и записи в БД. Ротацию выполняет rotate(attrs) подкласса
+    """
+
+    def rotate_and_audit(self, attrs):
+        data = self.rotate(attrs)
+        if get_audit_log() is not None:
+            audit('rotated', self.token_class(attrs['refresh'], verify=False))
+        return data
+
+    def validate(self, attrs):
+        cache = get_rotation_cache()
+        if cache is None or not api_settings.ROTATE_REFRESH_TOKENS:
+            return self.rotate_and_audit(attrs)
+        raw_token = attrs['refresh']
+        # Подпись не проверяется: JTI нужен только как ключ, совпадение проверяется по хешу токена
+        jti = self.token_class(raw_token, verify=False).get(api_settings.JTI_CLAIM)
+        digest = token_digest(raw_token)
+        with cache.key_lock(jti):
+            data = cache.get(jti, digest)
+            if data is None:
+                data = self.rotate_and_audit(attrs)
+                cache.set(jti, digest, data)
+        return data
+
+
+class TokenRefreshSerializer(RotationGraceMixin, serializers.Serializer):
     """
     Обновление access токена с помощью refresh токена
     """
@@ -79,7 +125,7 @@ class TokenRefreshSerializer(serializers.Serializer):
     access = serializers.CharField(read_only=True)
     token_class = RefreshToken
 
-    def validate(self, attrs):
+    def rotate(self, attrs):
         refresh = self.token_class(attrs['refresh'])
         data = {'access': str(refresh.access_token)}
         if api_settings.ROTATE_REFRESH_TOKENS:
@@ -95,6 +141,22 @@ class TokenRefreshSerializer(serializers.Serializer):
         return data
 
 
+class TokenRefreshSlidingSerializer(serializers.Serializer):
+    """
+    Обновление sliding токена до истечения SLIDING_TOKEN_REFRESH_EXP_CLAIM, без обращения к БД
+    """
+    token = serializers.CharField()
+    token_class = SlidingToken
+
+    def validate(self, attrs):
+        # "exp" может уже истечь, обновление ограничено только сроком refresh_exp
+        token = self.token_class(attrs['token'], verify_exp=False)
+        token.check_exp(api_settings.SLIDING_TOKEN_REFRESH_EXP_CLAIM)
+        token.set_exp()
+        token.set_iat()
+        return {'token': str(token)}
+
+
 class TokenBlacklistSerializer(serializers.Serializer):
     """
     Добавление токена в чёрный список
@@ -111,12 +173,12 @@ class TokenBlacklistSerializer(serializers.Serializer):
         return {}
 
 
-class RotatedRefreshTokenSerializer(serializers.Serializer):
+class RotatedRefreshTokenSerializer(RotationGraceMixin, serializers.Serializer):
     refresh = serializers.CharField()
     access = serializers.CharField(read_only=True)
     token_class = RefreshToken
 
-    def validate(self, attrs):
+    def rotate(self, attrs):
         refresh = self.token_class(attrs['refresh'])
         try:
             refresh.blacklist()
@@ -127,14 +189,18 @@ class RotatedRefreshTokenSerializer(serializers.Serializer):
             'access': str(refresh.access_token)
         }
         if api_settings.ROTATE_REFRESH_TOKENS:
-            if api_settings.BLACKLIST_AFTER_ROTATION:
-                try:
-                    refresh.blacklist()
-                except AttributeError:
-                    pass
+            # Предъявленный токен уже в черном списке выше, независимо от BLACKLIST_AFTER_ROTATION
             refresh.set_jti()
             refresh.set_exp()
             refresh.set_iat()
             data['refresh'] = str(refresh)
         return data
 
+
+class OutstandingTokenSerializer(serializers.ModelSerializer):
+    """
+    Сессия пользователя (незавершенный refresh токен)
+    """
+    class Meta:
+        model = OutstandingToken
+        fields = ('id', 'jti', 'created_at', 'expires_at')
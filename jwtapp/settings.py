@@ -11,14 +11,19 @@ DEFAULTS = {
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': False,
     'UPDATE_LAST_LOGIN': False,
+    'LAST_LOGIN_FLUSH_INTERVAL': None,
+    'LAST_LOGIN_MAX_PENDING': 10000,
     'ALGORITHM': 'HS512',
     'SIGNING_KEY': settings.SECRET_KEY,
     'VERIFYING_KEY': '',
+    'SIGNING_KEY_ID': None,
+    'VALIDATE_KEYS_ON_READY': True,
     'AUDIENCE': None,
     'ISSUER': None,
     'JSON_ENCODER': None,
     'JWK_URL': None,
     'LEEWAY': 0,
+    'CLOCK': None,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
@@ -27,13 +32,55 @@ DEFAULTS = {
     'AUTH_TOKEN_CLASSES': ('jwtapp.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
     'JTI_CLAIM': 'jti',
+    'TOKEN_FORMAT': 'jwt',
+    'COMPACT_CLAIM_ALIASES': {
+        'token_type': 't',
+        'user_id': 'u',
+        'refresh_exp': 'r',
+    },
     'TOKEN_OBTAIN_SERIALIZER': 'jwtapp.serializers.TokenObtainPairSerializer',
     'TOKEN_REFRESH_SERIALIZER': 'jwtapp.serializers.TokenRefreshSerializer',
     'TOKEN_BLACKLIST_SERIALIZER': 'jwtapp.serializers.TokenBlacklistSerializer',
+    'SLIDING_TOKEN_OBTAIN_SERIALIZER': 'jwtapp.serializers.TokenObtainSlidingSerializer',
+    'SLIDING_TOKEN_REFRESH_SERIALIZER': 'jwtapp.serializers.TokenRefreshSlidingSerializer',
+    'SLIDING_TOKEN_LIFETIME': timedelta(minutes=5),
+    'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
+    'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
+    'ACCESS_TOKEN_RENEW_WINDOW': None,
+    'ACCESS_TOKEN_RENEW_HEADER': 'X-Access-Token',
+    'ACCESS_TOKEN_RENEW_MAX_AGE': None,
+    'ROTATION_GRACE_PERIOD': None,
+    'ROTATION_CACHE_MAX_SIZE': 10000,
+    'ROTATION_CACHE_ALIAS': None,
+    'READ_REPLICA_DATABASE': None,
+    'READ_REPLICA_PIN_SECONDS': 5,
+    'TOKEN_SHARDS': (),
+    'TRACK_OUTSTANDING_TOKENS': True,
+    'TOKEN_BUCKET_PERIOD': None,
+    'WARM_UP_ON_READY': False,
+    'PASSWORD_HASH_PARAMS': None,
+    'REVOCATION_FEED_INTERVAL': None,
+    'REVOCATION_FEED_MAX_BATCH': 10000,
+    'REVOCATION_FEED_OVERLAP': 5,
+    'TOKEN_OBTAIN_IP_RATE': None,
+    'TOKEN_OBTAIN_USERNAME_RATE': None,
+    'TOKEN_OBTAIN_MAX_CONCURRENT': None,
+    'THROTTLE_CACHE_ALIAS': None,
+    'THROTTLE_MAX_KEYS': 100000,
+    'AUDIT_SINK': None,
+    'AUDIT_FILE_PATH': 'audit.jsonl',
+    'AUDIT_FILE_MAX_BYTES': 100 * 1024 * 1024,
+    'AUDIT_FILE_BACKUP_COUNT': 5,
+    'AUDIT_QUEUE_SIZE': 10000,
+    'AUDIT_QUEUE_POLICY': 'drop',
+    'AUDIT_BATCH_SIZE': 500,
+    'AUDIT_FLUSH_INTERVAL': 1.0,
 }
 
 IMPORT_STRINGS = (
     'AUTH_TOKEN_CLASSES',
+    'AUDIT_SINK',
+    'CLOCK',
     'JSON_ENCODER',
     'USER_AUTHENTICATION_RULE',
 )
@@ -43,10 +90,11 @@ api_settings = APISettings(USER_SETTINGS, DEFAULTS, IMPORT_STRINGS)
 
 
 def reload_api_settings(*args, **kwargs):
-    global api_settings
     setting, value = kwargs['setting'], kwargs['value']
     if setting == 'JWTAPP':
-        api_settings = APISettings(value, DEFAULTS, IMPORT_STRINGS)
+        # Модули импортируют api_settings по имени: объект обновляется на месте
+        api_settings.reload()
+        api_settings._user_settings = value or {}
 
 
 setting_changed.connect(reload_api_settings)
@@ -0,0 +1,52 @@
+from zlib import crc32
+from django.db import router
+from .settings import api_settings
+
+
+def get_shards():
+    return tuple(api_settings.TOKEN_SHARDS or ())
+
+
+def shard_for(key):
+    """
+    Возвращает алиас БД для ключа шардирования или None, если шардирование выключено
+    """
+    shards = get_shards()
+    if not shards:
+        return None
+    return shards[crc32(str(key).encode()) % len(shards)]
+
+
+def database_for_payload(payload):
+    """
+    Шард токена: по идентификатору пользователя, для токенов без пользователя - по JTI
+    """
+    return shard_for(payload.get(api_settings.USER_ID_CLAIM, payload.get(api_settings.JTI_CLAIM)))
+
+
+def database_for_user(user):
+    """
+    Шард со всеми токенами пользователя
+    """
+    user_id = getattr(user, api_settings.USER_ID_FIELD)
+    if not isinstance(user_id, int):
+        user_id = str(user_id)
+    return shard_for(user_id)
+
+
+def token_databases(model):
+    """
+    Все БД с токенами: шарды или основная БД для записи
+    """
+    return get_shards() or (router.db_for_write(model),)
+
+
+def detach_user_tokens(sender, instance, **kwargs):
+    """
+    Обнуляет пользователя у токенов в шарде после удаления пользователя (аналог SET_NULL между БД)
+    """
+    db = database_for_user(instance)
+    if db is None:
+        return
+    from .tokens_models.models import OutstandingToken
+    OutstandingToken.objects.using(db).filter(user_id=instance.pk).update(user=None)
@@ -10,4 +10,7 @@ token_backend = TokenBackend(
     api_settings.JWK_URL,
     api_settings.LEEWAY,
     api_settings.JSON_ENCODER,
+    api_settings.JTI_CLAIM,
+    api_settings.COMPACT_CLAIM_ALIASES,
+    api_settings.SIGNING_KEY_ID,
 )
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+from .exceptions import ServiceUnavailable
+from .settings import api_settings
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_buckets = None
+_admission = None
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """
+    '20/min' -> (20, 60): ёмкость корзины и время её полного пополнения в секундах
+    """
+    if not rate:
+        return None
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+def refill(state, capacity, period, now):
+    """
+    Списывает токен из корзины. Возвращает новое состояние и секунды ожидания (0 - запрос разрешён)
+    """
+    tokens, updated = state if state is not None else (capacity, now)
+    rate = capacity / period
+    tokens = min(capacity, tokens + max(0, now - updated) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBuckets:
+    """
+    Token buckets в памяти процесса, не больше max_keys ключей (вытесняются давно не использованные)
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, period):
+        now = time.monotonic()
+        with self._lock:
+            state, wait = refill(self._buckets.pop(key, None), capacity, period, now)
+            self._buckets[key] = state
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheBuckets:
+    """
+    Token buckets в кеше Django, общие для всех процессов. Чтение и запись не атомарны:
+    при одновременных запросах лимит может быть превышен на число параллельных запросов
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def consume(self, key, capacity, period):
+        cache = caches[self.alias]
+        cache_key = f'jwtapp:throttle:{key}'
+        state, wait = refill(cache.get(cache_key), capacity, period, time.time())
+        cache.set(cache_key, state, timeout=period)
+        return wait
+
+
+def get_buckets():
+    global _buckets
+    alias = api_settings.THROTTLE_CACHE_ALIAS
+    max_keys = api_settings.THROTTLE_MAX_KEYS
+    with _lock:
+        if alias is not None:
+            if not isinstance(_buckets, CacheBuckets) or _buckets.alias != alias:
+                _buckets = CacheBuckets(alias)
+        elif not isinstance(_buckets, LocalBuckets) or _buckets.max_keys != max_keys:
+            _buckets = LocalBuckets(max_keys)
+    return _buckets
+
+
+class TokenObtainThrottle(BaseThrottle):
+    """
+    Ограничивает частоту входа по IP (TOKEN_OBTAIN_IP_RATE) и по имени пользователя
+    (TOKEN_OBTAIN_USERNAME_RATE). Выполняется в initial() до аутентификации и хеширования пароля
+    """
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+        checks = []
+        ip_rate = parse_rate(api_settings.TOKEN_OBTAIN_IP_RATE)
+        if ip_rate:
+            checks.append((f'ip:{self.get_ident(request)}', ip_rate))
+        username_rate = parse_rate(api_settings.TOKEN_OBTAIN_USERNAME_RATE)
+        username = request.data.get(get_user_model().USERNAME_FIELD) if hasattr(request.data, 'get') else None
+        if username_rate and isinstance(username, str):
+            checks.append((f'username:{username.lower()}', username_rate))
+
+        buckets = get_buckets()
+        for key, (capacity, period) in checks:
+            self.wait_seconds = buckets.consume(key, capacity, period)
+            if self.wait_seconds:
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+@contextmanager
+def admission_slot():
+    """
+    Ограничивает число одновременных входов в процессе (TOKEN_OBTAIN_MAX_CONCURRENT).
+    Сверх лимита запрос сразу отклоняется с 503 и Retry-After, а не ждёт в очереди
+    """
+    global _admission
+    limit = api_settings.TOKEN_OBTAIN_MAX_CONCURRENT
+    if not limit:
+        yield
+        return
+    with _lock:
+        if _admission is None or _admission[0] != limit:
+            _admission = (limit, threading.BoundedSemaphore(limit))
+        semaphore = _admission[1]
+    if not semaphore.acquire(blocking=False):
+        raise ServiceUnavailable()
+    try:
+        yield
+    finally:
+        semaphore.release()
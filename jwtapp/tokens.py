@@ -1,42 +1,90 @@
 from datetime import timedelta
+from functools import lru_cache
 from uuid import uuid4
 from django.conf import settings
 from django.utils.module_loading import import_string
+from .audit import audit
+from .buckets import token_model_pairs_for_payload, token_models_for_payload
 from .exceptions import TokenBackendError, TokenError
+from .revocation import get_revocation_feed
+from .routers import pin_token_user
 from .settings import api_settings
-from .tokens_models.models import BlacklistedToken, OutstandingToken
-from .utils import aware_utcnow, datetime_from_epoch, datetime_to_epoch
-import bcrypt
+from .sharding import database_for_payload, database_for_user
+from .utils import aware_utcnow, datetime_from_epoch, datetime_to_epoch, epoch_now
 
-salt = bcrypt.gensalt()
+
+@lru_cache(maxsize=None)
+def get_salt():
+    """
+    Соль bcrypt для хранения outstanding токенов. bcrypt импортируется при первой выдаче токена
+    """
+    import bcrypt
+    return bcrypt.gensalt()
+
+
+def hash_token(token):
+    import bcrypt
+    return bcrypt.hashpw(str(token).encode(), get_salt())
+
+
+def revoke_all_sessions(user):
+    """
+    Завершает все сессии пользователя: токены, выданные не позже этого момента, отклоняются
+    check_session_cutoff независимо от наличия записей OutstandingToken
+    """
+    from .tokens_models.models import SessionCutoff
+    user_id = getattr(user, api_settings.USER_ID_FIELD)
+    SessionCutoff.objects.using(database_for_user(user)).update_or_create(
+        user_id=str(user_id), defaults={'revoked_before': aware_utcnow()},
+    )
+
+
+def check_session_cutoff(payload):
+    """
+    Вызывает TokenError, если токен выдан до завершения всех сессий пользователя (revoke_all_sessions)
+    """
+    if 'jwtapp.tokens_models' not in settings.INSTALLED_APPS:
+        return
+    from .tokens_models.models import SessionCutoff
+    user_id = payload.get(api_settings.USER_ID_CLAIM)
+    if user_id is None or 'iat' not in payload:
+        return
+    pin_token_user(payload)
+    revoked_before = SessionCutoff.objects.using(database_for_payload(payload)).filter(
+        user_id=str(user_id),
+    ).values_list('revoked_before', flat=True).first()
+    if revoked_before is not None and payload['iat'] <= datetime_to_epoch(revoked_before):
+        raise TokenError('Сессия завершена')
 
 
 class Token:
     """
-    Проверяет и обертывает существующий JWT или может использоваться для создания нового JWT
+    Проверяет и обертывает существующий JWT или может использоваться для создания нового JWT.
+    Без __dict__: токены создаются на каждый запрос, а claims непроверенного токена
+    разбираются только при первом обращении
     """
 
+    __slots__ = ('token', 'current_time', '_payload')
+
     token_type = None
     lifetime = None
+    # Формат кодирования: 'jwt', 'compact' или 'cwt'; None - TOKEN_FORMAT из настроек
+    token_format = None
 
-    def __init__(self, token=None, verify=True):
+    def __init__(self, token=None, verify=True, verify_exp=True):
         if self.token_type is None or self.lifetime is None:
             raise TokenError('Невозможно создать токен без типа или срока действия')
 
         self.token = token
-        self.current_time = aware_utcnow()
+        # Целые секунды epoch; datetime создаются только для записей в БД
+        self.current_time = epoch_now()
+        self._payload = None
 
         if token is not None:
-            # Был предоставлен зашифрованный токен
-            token_backend = self.get_token_backend()
-
-            # Раскодирование токена
-            try:
-                self.payload = token_backend.decode(token, verify=verify)
-            except TokenBackendError:
-                raise TokenError('Неверный токен или срок его действия истёк')
-
+            # Был предоставлен зашифрованный токен. Без проверки подписи claims
+            # раскодируются при первом обращении к payload
             if verify:
+                self._payload = self.decode(verify_exp=verify_exp)
                 self.verify()
         else:
             # Новый токен, пропускаем все шаги верификации
@@ -49,6 +97,38 @@ class Token:
             # Задаём значение для 'jti'
             self.set_jti()
 
+    def decode(self, verify=True, verify_exp=True):
+        """
+        Раскодирует исходную строку токена в словарь claims
+        """
+        try:
+            return self.get_token_backend().decode(self.token, verify=verify, verify_exp=verify_exp)
+        except TokenBackendError:
+            raise TokenError('Неверный токен или срок его действия истёк')
+
+    @property
+    def payload(self):
+        if self._payload is None:
+            self._payload = self.decode(verify=False)
+        return self._payload
+
+    @payload.setter
+    def payload(self, payload):
+        self._payload = payload
+
+    def copy_claims(self, token, no_copy):
+        """
+        Переносит в token все claims, кроме no_copy, одной операцией над словарём.
+        Собственные no_copy claims токена сохраняются
+        """
+        own = token.payload
+        payload = {**self.payload, **{claim: own[claim] for claim in no_copy if claim in own}}
+        for claim in no_copy:
+            if claim not in own:
+                payload.pop(claim, None)
+        token.payload = payload
+        return token
+
     def __repr__(self):
         return repr(self.payload)
 
@@ -71,7 +151,7 @@ class Token:
         """
         Возвращает токен в виде строки в кодировке base64
         """
-        return self.get_token_backend().encode(self.payload)
+        return self.get_token_backend().encode(self.payload, self.token_format or api_settings.TOKEN_FORMAT)
 
     def verify(self):
         """
@@ -107,7 +187,7 @@ class Token:
 
     def set_exp(self, claim='exp', from_time=None, lifetime=None):
         """
-        Задаёт срок действия токена
+        Задаёт срок действия токена. from_time - секунды epoch, lifetime - timedelta
         """
         if from_time is None:
             from_time = self.current_time
@@ -115,16 +195,16 @@ class Token:
         if lifetime is None:
             lifetime = self.lifetime
 
-        self.payload[claim] = datetime_to_epoch(from_time + lifetime)
+        self.payload[claim] = from_time + int(lifetime.total_seconds())
 
     def set_iat(self, claim='iat', at_time=None):
         """
-        Задаёт время выдачи токена.
+        Задаёт время выдачи токена в секундах epoch
         """
         if at_time is None:
             at_time = self.current_time
 
-        self.payload[claim] = datetime_to_epoch(at_time)
+        self.payload[claim] = at_time
 
     def check_exp(self, claim='exp', current_time=None):
         """
@@ -138,9 +218,7 @@ class Token:
         except KeyError:
             raise TokenError(f'У токена нет "{claim}"')
 
-        claim_time = datetime_from_epoch(claim_value)
-        leeway = self.get_token_backend().get_leeway()
-        if claim_time <= current_time - leeway:
+        if claim_value <= current_time - self.get_token_backend().leeway_seconds:
             raise TokenError(f'Token "{claim}" claim has expired')
 
     @classmethod
@@ -155,6 +233,7 @@ class Token:
 
         token = cls()
         token[api_settings.USER_ID_CLAIM] = user_id
+        audit('issued', token)
 
         return token
 
@@ -162,11 +241,12 @@ class Token:
 
     @property
     def token_backend(self):
-        if self._token_backend is None:
-            self._token_backend = import_string(
+        # Кэшируется на классе: у экземпляров нет __dict__
+        if Token._token_backend is None:
+            Token._token_backend = import_string(
                 'jwtapp.state.token_backend'
             )
-        return self._token_backend
+        return Token._token_backend
 
     def get_token_backend(self):
         return self.token_backend
@@ -177,6 +257,8 @@ class BlacklistMixin:
     Черный список токенов
     """
 
+    __slots__ = ()
+
     if 'jwtapp.tokens_models' in settings.INSTALLED_APPS:
 
         def verify(self, *args, **kwargs):
@@ -188,10 +270,25 @@ class BlacklistMixin:
             """
             Проверяет присутствие токена в черном списке, если токен там, то вызывает 'TokenError'.
             """
-            jti = self.payload[api_settings.JTI_CLAIM]
+            if not api_settings.TRACK_OUTSTANDING_TOKENS:
+                # Записей OutstandingToken нет до отзыва: завершение всех сессий хранится в SessionCutoff
+                check_session_cutoff(self.payload)
 
-            if BlacklistedToken.objects.filter(token__jti=jti).exists():
-                raise TokenError('Токен в чёрном списке')
+            jti = self.payload[api_settings.JTI_CLAIM]
+            feed = get_revocation_feed()
+            revoked = feed.is_revoked(jti) if feed is not None else None
+            if revoked is not None:
+                # Локальная копия черного списка, обновляемая раз в REVOCATION_FEED_INTERVAL секунд
+                if revoked:
+                    raise TokenError('Токен в чёрном списке')
+                return
+
+            # Отзыв в недавнем запросе пользователя мог ещё не дойти до реплики
+            pin_token_user(self.payload)
+            db = database_for_payload(self.payload)
+            for _, blacklisted_model in token_model_pairs_for_payload(self.payload, db):
+                if blacklisted_model.objects.using(db).filter(token__jti=jti).exists():
+                    raise TokenError('Токен в чёрном списке')
 
         def blacklist(self):
             """
@@ -200,30 +297,46 @@ class BlacklistMixin:
             """
             jti = self.payload[api_settings.JTI_CLAIM]
             exp = self.payload['exp']
-            token, _ = OutstandingToken.objects.get_or_create(
-                jti=jti,
-                defaults={
-                    'token': str(self),
-                    'expires_at': datetime_from_epoch(exp),
-                },
-            )
-            return BlacklistedToken.objects.get_or_create(token=token)
+            db = database_for_payload(self.payload)
+            defaults = {
+                'token': str(self),
+                'expires_at': datetime_from_epoch(exp),
+            }
+            if not api_settings.TRACK_OUTSTANDING_TOKENS:
+                # Запись не создавалась при выдаче: восстанавливаем её из данных токена
+                if 'iat' in self.payload:
+                    defaults['created_at'] = datetime_from_epoch(self.payload['iat'])
+                if api_settings.USER_ID_FIELD in ('id', 'pk'):
+                    defaults['user_id'] = self.payload.get(api_settings.USER_ID_CLAIM)
+            outstanding_model, blacklisted_model = token_models_for_payload(self.payload, db)
+            token, _ = outstanding_model.objects.db_manager(db).get_or_create(jti=jti, defaults=defaults)
+            result = blacklisted_model.objects.db_manager(db).get_or_create(token=token)
+            feed = get_revocation_feed()
+            if feed is not None:
+                feed.add(jti, exp)
+            audit('blacklisted', self)
+            return result
 
         @classmethod
         def for_user(cls, user):
             """
-            Добавляет данный токен в список незавершенных
+            Добавляет данный токен в список незавершенных.
+            При TRACK_OUTSTANDING_TOKENS = False запись создаётся только при добавлении в черный список
             """
             token = super().for_user(user)
+            if not api_settings.TRACK_OUTSTANDING_TOKENS:
+                return token
 
             jti = token[api_settings.JTI_CLAIM]
             exp = token['exp']
+            db = database_for_payload(token.payload)
+            outstanding_model, _ = token_models_for_payload(token.payload, db)
 
-            OutstandingToken.objects.create(
-                user=user,
+            outstanding_model.objects.db_manager(db).create(
+                user_id=user.pk,
                 jti=jti,
-                token=bcrypt.hashpw(str(token).encode(), salt),
-                created_at=token.current_time,
+                token=hash_token(token),
+                created_at=datetime_from_epoch(token.current_time),
                 expires_at=datetime_from_epoch(exp),
             )
 
@@ -231,11 +344,52 @@ class BlacklistMixin:
 
 
 class AccessToken(Token):
+    __slots__ = ()
+
     token_type = 'access'
     lifetime = api_settings.ACCESS_TOKEN_LIFETIME
+    # "iat" копируется: по нему ограничен общий срок продления
+    no_copy_claims = (
+        api_settings.TOKEN_TYPE_CLAIM,
+        'exp',
+        api_settings.JTI_CLAIM,
+        'jti',
+    )
+
+    def expires_within(self, window):
+        """
+        Проверяет, истекает ли токен в течение window (timedelta)
+        """
+        return self.payload['exp'] - self.current_time <= window.total_seconds()
+
+    def renewable_until(self):
+        """
+        Секунды epoch, после которых токен не продлевается: iat + ACCESS_TOKEN_RENEW_MAX_AGE
+        (по умолчанию REFRESH_TOKEN_LIFETIME)
+        """
+        max_age = api_settings.ACCESS_TOKEN_RENEW_MAX_AGE or api_settings.REFRESH_TOKEN_LIFETIME
+        return self.payload['iat'] + int(max_age.total_seconds())
+
+    def renewed(self):
+        """
+        Возвращает новый access токен с теми же данными, включая "iat", и новым сроком действия не позже
+        renewable_until(). Вызывает TokenError, если срок продления прошёл или сессии пользователя завершены
+        """
+        if 'iat' not in self.payload:
+            raise TokenError('У токена нет "iat"')
+        limit = self.renewable_until()
+        if self.current_time >= limit:
+            raise TokenError('Срок продления токена истёк')
+        check_session_cutoff(self.payload)
+
+        access = self.copy_claims(type(self)(), self.no_copy_claims)
+        access['exp'] = min(access['exp'], limit)
+        return access
 
 
 class RefreshToken(BlacklistMixin, Token):
+    __slots__ = ()
+
     token_type = 'refresh'
     lifetime = api_settings.REFRESH_TOKEN_LIFETIME
     no_copy_claims = (
@@ -253,16 +407,35 @@ class RefreshToken(BlacklistMixin, Token):
         """
         access = self.access_token_class()
         access.set_exp(from_time=self.current_time)
-        no_copy = self.no_copy_claims
-        for claim, value in self.payload.items():
-            if claim in no_copy:
-                continue
-            access[claim] = value
 
-        return access
+        return self.copy_claims(access, self.no_copy_claims)
+
+
+class SlidingToken(Token):
+    """
+    Единый токен без пары access/refresh: короткий "exp" и длинный срок обновления в
+    SLIDING_TOKEN_REFRESH_EXP_CLAIM. Обновляется без обращения к БД
+    """
+    __slots__ = ()
+
+    token_type = 'sliding'
+    lifetime = api_settings.SLIDING_TOKEN_LIFETIME
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if self.token is None:
+            # Новый токен: задаём крайний срок, до которого его можно обновлять
+            self.set_exp(
+                api_settings.SLIDING_TOKEN_REFRESH_EXP_CLAIM,
+                from_time=self.current_time,
+                lifetime=api_settings.SLIDING_TOKEN_REFRESH_LIFETIME,
+            )
 
 
 class UntypedToken(Token):
+    __slots__ = ()
+
     token_type = 'untyped'
     lifetime = timedelta(seconds=0)
 
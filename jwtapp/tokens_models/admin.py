@@ -1,5 +1,141 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from jwtapp.sharding import get_shards
+from jwtapp.utils import aware_utcnow
 from .models import BlacklistedToken, OutstandingToken
 
-admin.site.register(BlacklistedToken)
-admin.site.register(OutstandingToken)
+# Ниже этого числа строк список считается точным COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+def estimated_count(queryset):
+    """
+    Оценка числа строк таблицы из статистики PostgreSQL (pg_class.reltuples) или None
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                       (queryset.model._meta.db_table,))
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Для списка без фильтров использует оценку числа строк вместо полного COUNT(*)
+    """
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """
+    Выбор шарда в списке токенов (TOKEN_SHARDS), по умолчанию первый шард
+    """
+    title = 'шард'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(shard, shard) for shard in get_shards()]
+
+    def queryset(self, request, queryset):
+        shards = get_shards()
+        if not shards:
+            return queryset
+        return queryset.using(self.value() if self.value() in shards else shards[0])
+
+
+class ExpiryListFilter(admin.SimpleListFilter):
+    """
+    Фильтр по сроку действия по индексу expires_at
+    """
+    title = 'срок действия'
+    parameter_name = 'expiry'
+    field_name = 'expires_at'
+
+    def lookups(self, request, model_admin):
+        return (('alive', 'действует'), ('expired', 'истёк'))
+
+    def queryset(self, request, queryset):
+        if self.value() == 'alive':
+            return queryset.filter(**{f'{self.field_name}__gt': aware_utcnow()})
+        if self.value() == 'expired':
+            return queryset.filter(**{f'{self.field_name}__lte': aware_utcnow()})
+        return queryset
+
+
+class TokenExpiryListFilter(ExpiryListFilter):
+    field_name = 'token__expires_at'
+
+
+class ShardedModelAdmin(admin.ModelAdmin):
+    """
+    Список токенов выводится по одному шарду, карточка токена ищется во всех шардах
+    """
+    list_filter = (ShardListFilter,)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
+    list_per_page = 50
+
+    def get_object(self, request, object_id, from_field=None):
+        shards = get_shards()
+        if not shards:
+            return super().get_object(request, object_id, from_field)
+        for shard in shards:
+            queryset = self.get_queryset(request).using(shard)
+            field = queryset.model._meta.pk if from_field is None else queryset.model._meta.get_field(from_field)
+            try:
+                return queryset.get(**{field.name: field.to_python(object_id)})
+            except (queryset.model.DoesNotExist, ValueError):
+                continue
+        return None
+
+    @admin.action(description='Удалить все истёкшие токены')
+    def purge_expired(self, request, queryset):
+        deleted = OutstandingToken.objects.using(queryset.db).purge_expired()
+        self.message_user(request, f'Удалено истёкших токенов: {deleted}', messages.SUCCESS)
+
+
+@admin.register(OutstandingToken)
+class OutstandingTokenAdmin(ShardedModelAdmin):
+    list_display = ('id', 'jti', 'user_id', 'created_at', 'expires_at')
+    list_filter = (ShardListFilter, ExpiryListFilter)
+    search_fields = ('=jti',)
+    raw_id_fields = ('user',)
+    actions = ('blacklist_selected', 'purge_expired')
+
+    @admin.action(description='Добавить выбранные токены в черный список')
+    def blacklist_selected(self, request, queryset):
+        added = queryset.blacklist()
+        self.message_user(request, f'Добавлено в черный список: {added}', messages.SUCCESS)
+
+
+@admin.register(BlacklistedToken)
+class BlacklistedTokenAdmin(ShardedModelAdmin):
+    list_display = ('id', 'token_jti', 'token_user_id', 'blacklisted_at')
+    list_filter = (ShardListFilter, TokenExpiryListFilter)
+    list_select_related = ('token',)
+    search_fields = ('=token__jti',)
+    raw_id_fields = ('token',)
+    actions = ('purge_expired',)
+
+    @admin.display(description='jti', ordering='token__jti')
+    def token_jti(self, obj):
+        return obj.token.jti
+
+    @admin.display(description='пользователь')
+    def token_user_id(self, obj):
+        return obj.token.user_id
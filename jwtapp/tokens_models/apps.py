@@ -6,3 +6,22 @@ class TokenBlacklistConfig(AppConfig):
     name = "jwtapp.tokens_models"
     verbose_name = _("Token Blacklist")
     default_auto_field = "django.db.models.BigAutoField"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.models.signals import post_delete, post_save
+        from jwtapp.settings import api_settings
+        from jwtapp.routers import remember_user_write
+        from jwtapp.sharding import detach_user_tokens
+        from .models import BlacklistedToken, OutstandingToken, SessionCutoff
+        post_delete.connect(detach_user_tokens, sender=settings.AUTH_USER_MODEL,
+                            dispatch_uid='jwtapp_detach_user_tokens')
+        for sender in (settings.AUTH_USER_MODEL, OutstandingToken, BlacklistedToken, SessionCutoff):
+            post_save.connect(remember_user_write, sender=sender, dispatch_uid=f'jwtapp_remember_write_{sender}')
+        if api_settings.WARM_UP_ON_READY:
+            # Без обращения к БД: соединения открываются в warm_up(connect=True) после fork воркера
+            from jwtapp.warmup import warm_up
+            warm_up()
+        elif api_settings.VALIDATE_KEYS_ON_READY:
+            from jwtapp.warmup import validate_signing_keys
+            validate_signing_keys()
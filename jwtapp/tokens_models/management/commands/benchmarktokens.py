@@ -0,0 +1,99 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from jwtapp.backends import CBOR_AVAILABLE, COSE_ALGORITHMS, TOKEN_FORMATS, TokenBackend
+from jwtapp.exceptions import TokenBackendError
+from jwtapp.keys import HMAC_ALGORITHMS, generate_key_pair, generate_secret
+from jwtapp.settings import api_settings
+from jwtapp.state import token_backend
+from jwtapp.tokens import RefreshToken
+from jwtapp.utils import FrozenClock, set_clock
+
+
+class Command(BaseCommand):
+    help = ("Сравнивает размер токенов и скорость подписи/проверки для форматов jwt, compact и cwt "
+            "и алгоритмов подписи")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formats', nargs='+', choices=TOKEN_FORMATS, default=list(TOKEN_FORMATS))
+        parser.add_argument('--algorithms', nargs='+', choices=list(COSE_ALGORITHMS),
+                            help='Алгоритмы со сгенерированными на время замера ключами, '
+                                 'по умолчанию ALGORITHM и ключи из настроек')
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--json', action='store_true', help='Вывод в JSON')
+        parser.add_argument('--clock', type=int,
+                            help='Время в секундах epoch, на котором часы замораживаются на время замера '
+                                 '(по умолчанию текущее). Одинаковое значение даёт одинаковые exp/iat между запусками')
+
+    def timed(self, func, iterations):
+        """
+        Операций в секунду для func
+        """
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return iterations / (time.perf_counter() - started)
+
+    def make_backend(self, algorithm):
+        """
+        TokenBackend с новым ключом для algorithm и теми же claims, что у token_backend из настроек
+        """
+        if algorithm in HMAC_ALGORITHMS:
+            signing_key, verifying_key = generate_secret(algorithm), ''
+        else:
+            signing_key, verifying_key = generate_key_pair(algorithm)
+        backend = TokenBackend(
+            algorithm, signing_key, verifying_key,
+            jti_claim=api_settings.JTI_CLAIM, compact_claims=api_settings.COMPACT_CLAIM_ALIASES,
+        )
+        backend.validate_keys()
+        return backend
+
+    def measure(self, backends, formats, iterations):
+        refresh = RefreshToken()
+        refresh[api_settings.USER_ID_CLAIM] = 1
+        payloads = {'access': refresh.access_token.payload, 'refresh': refresh.payload}
+        results = []
+        for backend in backends:
+            results.extend(self.measure_backend(backend, payloads, formats, iterations))
+        return results
+
+    def measure_backend(self, token_backend, payloads, formats, iterations):
+        results = []
+        for token_format in formats:
+            for token_type, payload in payloads.items():
+                encoded = token_backend.encode(payload, token_format)
+                results.append({
+                    'algorithm': token_backend.algorithm,
+                    'format': token_format,
+                    'token_type': token_type,
+                    'size': len(encoded),
+                    'encode_per_sec': round(self.timed(lambda: token_backend.encode(payload, token_format), iterations)),
+                    'decode_per_sec': round(self.timed(lambda: token_backend.decode(encoded), iterations)),
+                })
+        return results
+
+    def handle(self, *args, **options):
+        formats = options['formats']
+        if 'cwt' in formats and not CBOR_AVAILABLE:
+            raise CommandError('Для формата cwt требуется пакет cbor2')
+        try:
+            backends = [self.make_backend(algorithm) for algorithm in options['algorithms'] or ()] or [token_backend]
+        except TokenBackendError as ex:
+            raise CommandError(str(ex))
+        # Замороженные часы: токены замера не зависят от момента запуска
+        previous = set_clock(FrozenClock(options['clock']))
+        try:
+            results = self.measure(backends, formats, options['iterations'])
+        finally:
+            set_clock(previous)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=4))
+            return
+        self.stdout.write(f'{"алгоритм":<10}{"формат":<10}{"тип":<10}{"байт":>8}{"encode/с":>12}{"decode/с":>12}')
+        for row in results:
+            self.stdout.write(
+                f'{row["algorithm"]:<10}{row["format"]:<10}{row["token_type"]:<10}{row["size"]:>8}'
+                f'{row["encode_per_sec"]:>12}{row["decode_per_sec"]:>12}'
+            )
@@ -0,0 +1,107 @@
+import os
+from itertools import islice
+from django.core.management.base import BaseCommand
+from jwtapp.buckets import token_model_pairs, token_models_for_payload
+from jwtapp.exceptions import TokenBackendError
+from jwtapp.settings import api_settings
+from jwtapp.sharding import database_for_payload, token_databases
+from jwtapp.state import token_backend
+from jwtapp.utils import aware_utcnow, datetime_from_epoch
+from ...models import BlacklistedToken, OutstandingToken
+from ..streams import iter_tokens, open_input
+
+
+class Command(BaseCommand):
+    help = ("Добавляет в чёрный список токены или JTI из файла или stdin. "
+            "Записи создаются пачками через bulk_create, повторный запуск безопасен")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Файл с токенами или JTI, "-" - stdin')
+        parser.add_argument('--field', help='Поле с токеном или JTI, если вход в формате JSONL')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--state', help='Файл с числом обработанных строк для продолжения после прерывания')
+
+    def read_state(self, path):
+        if path and os.path.exists(path):
+            with open(path) as state:
+                return int(state.read().strip() or 0)
+        return 0
+
+    def write_state(self, path, processed):
+        if path:
+            with open(f'{path}.tmp', 'w') as state:
+                state.write(str(processed))
+            os.replace(f'{path}.tmp', path)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        skip = self.read_state(options['state'])
+        totals = {'processed': skip, 'blacklisted': 0, 'unknown': 0, 'expired': 0, 'invalid': 0}
+        with open_input(options['path']) as source:
+            items = islice(iter_tokens(source, options['field']), skip, None)
+            while True:
+                chunk = list(islice(items, chunk_size))
+                if not chunk:
+                    break
+                self.blacklist_chunk(chunk, totals)
+                totals['processed'] += len(chunk)
+                self.write_state(options['state'], totals['processed'])
+                self.stderr.write(' '.join(f'{name}={value}' for name, value in totals.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: добавлено {totals['blacklisted']}, не найдено {totals['unknown']}, "
+            f"истекло {totals['expired']}, некорректных {totals['invalid']}"
+        ))
+
+    def blacklist_chunk(self, chunk, totals):
+        now = aware_utcnow()
+        outstanding = {}
+        jtis = set()
+        for item in dict.fromkeys(chunk):
+            # Формат определяет token_backend.decode: CWT без точек, поэтому JTI - то, что не раскодировалось
+            try:
+                payload = token_backend.decode(item, verify_exp=False)
+            except TokenBackendError:
+                if item.count('.') == 2:
+                    totals['invalid'] += 1
+                else:
+                    jtis.add(item)
+                continue
+            jti = payload.get(api_settings.JTI_CLAIM)
+            if jti is None or 'exp' not in payload:
+                totals['invalid'] += 1
+                continue
+            expires_at = datetime_from_epoch(payload['exp'])
+            if expires_at <= now:
+                totals['expired'] += 1
+                continue
+            user_id = payload.get(api_settings.USER_ID_CLAIM) if api_settings.USER_ID_FIELD in ('id', 'pk') else None
+            db = database_for_payload(payload)
+            models = token_models_for_payload(payload, db)
+            outstanding.setdefault((db, *models), {})[jti] = models[0](
+                jti=jti, token=item, user_id=user_id, created_at=now, expires_at=expires_at,
+            )
+
+        for (db, outstanding_model, blacklisted_model), tokens in outstanding.items():
+            outstanding_model.objects.using(db).bulk_create(tokens.values(), ignore_conflicts=True)
+            totals['blacklisted'] += self.blacklist_jtis(db, tokens.keys(), outstanding_model, blacklisted_model)[1]
+
+        if jtis:
+            # Шард по одному JTI не определить: ищем во всех
+            found = 0
+            for db in token_databases(OutstandingToken):
+                for outstanding_model, blacklisted_model in token_model_pairs(db):
+                    db_found, db_added = self.blacklist_jtis(db, jtis, outstanding_model, blacklisted_model)
+                    found += db_found
+                    totals['blacklisted'] += db_added
+            totals['unknown'] += len(jtis) - found
+
+    def blacklist_jtis(self, db, jtis, outstanding_model=OutstandingToken, blacklisted_model=BlacklistedToken):
+        """
+        Возвращает число найденных токенов и число впервые добавленных в чёрный список
+        """
+        rows = outstanding_model.objects.using(db).filter(jti__in=list(jtis)).values_list('id', 'blacklistedtoken')
+        blacklisted = [
+            blacklisted_model(token_id=token_id) for token_id, blacklisted_id in rows if blacklisted_id is None
+        ]
+        blacklisted_model.objects.using(db).bulk_create(blacklisted, ignore_conflicts=True)
+        return len(rows), len(blacklisted)
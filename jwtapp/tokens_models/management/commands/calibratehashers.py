@@ -0,0 +1,74 @@
+import json
+import math
+import statistics
+import time
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+# Параметр стоимости и как от него зависит время хеширования
+COST_PARAMS = {
+    'pbkdf2_sha256': ('iterations', 'linear'),
+    'argon2': ('time_cost', 'linear'),
+    'bcrypt_sha256': ('rounds', 'log2'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Измеряет время хеширования паролей для PASSWORD_HASHERS на этом сервере и подбирает "
+            "параметры под целевое время одного хеша")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=250, help='Целевое время одного хеша, мс')
+        parser.add_argument('--samples', type=int, default=5, help='Число замеров на алгоритм')
+        parser.add_argument('--write', help='Записать параметры в JSON файл для JWTAPP["PASSWORD_HASH_PARAMS"]')
+
+    def measure(self, hasher, samples, **params):
+        """
+        Медиана времени хеширования в мс при заданных параметрах
+        """
+        probe = type(hasher)
+        if params:
+            probe = type(f'Probe{probe.__name__}', (probe,), params)
+        probe = probe()
+        timings = []
+        for _ in range(samples):
+            salt = probe.salt()
+            started = time.perf_counter()
+            probe.encode('calibration-password', salt)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def recommend(self, current, scale, measured, target):
+        if scale == 'log2':
+            return max(4, current + round(math.log2(target / measured)))
+        return max(1, round(current * target / measured))
+
+    def handle(self, *args, **options):
+        target = options['target_ms']
+        samples = options['samples']
+        recommended = {}
+        for hasher in get_hashers():
+            if hasher.algorithm not in COST_PARAMS:
+                self.stdout.write(f'{hasher.algorithm}: параметры стоимости не настраиваются')
+                continue
+            name, scale = COST_PARAMS[hasher.algorithm]
+            current = getattr(hasher, name)
+            try:
+                measured = self.measure(hasher, samples)
+            except ValueError as e:
+                # Библиотека алгоритма (argon2-cffi, bcrypt) не установлена
+                self.stderr.write(f'{hasher.algorithm}: {e}')
+                continue
+            value = self.recommend(current, scale, measured, target)
+            checked = self.measure(hasher, samples, **{name: value})
+            recommended[hasher.algorithm] = {name: value}
+            self.stdout.write(
+                f'{hasher.algorithm}: {name}={current} -> {measured:.1f} мс; '
+                f'рекомендуется {name}={value} -> {checked:.1f} мс'
+            )
+        if options['write']:
+            with open(options['write'], 'w', encoding='utf-8') as output:
+                json.dump(recommended, output, indent=4)
+            self.stdout.write(self.style.SUCCESS(f'Параметры записаны в {options["write"]}'))
+        else:
+            self.stdout.write(f"JWTAPP['PASSWORD_HASH_PARAMS'] = {recommended!r}")
@@ -0,0 +1,41 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.base import BaseCommand
+from jwtapp.buckets import token_model_pairs
+from jwtapp.sharding import token_databases
+from jwtapp.utils import aware_utcnow
+from ...models import BlacklistedToken
+
+
+class Command(BaseCommand):
+    help = "Выгружает чёрный список токенов в формате JSONL (построчно, курсором на стороне сервера)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', help='Файл для выгрузки, по умолчанию stdout')
+        parser.add_argument('--active', action='store_true', help='Только токены с неистёкшим сроком действия')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def iter_lines(self, active, chunk_size):
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        now = aware_utcnow()
+        for db in token_databases(BlacklistedToken):
+            for _, blacklisted_model in token_model_pairs(db, now if active else None):
+                queryset = blacklisted_model.objects.using(db).order_by()
+                if active:
+                    queryset = queryset.filter(token__expires_at__gt=now)
+                rows = queryset.values_list('token__jti', 'token__user_id', 'token__expires_at', 'blacklisted_at')
+                for jti, user_id, expires_at, blacklisted_at in rows.iterator(chunk_size=chunk_size):
+                    yield encoder.encode({
+                        'jti': jti,
+                        'user_id': user_id,
+                        'expires_at': expires_at,
+                        'blacklisted_at': blacklisted_at,
+                    }) + '\n'
+
+    def handle(self, *args, **options):
+        lines = self.iter_lines(options['active'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -1,4 +1,6 @@
 from django.core.management.base import BaseCommand
+from jwtapp.buckets import drop_expired_buckets
+from jwtapp.sharding import token_databases
 from jwtapp.utils import aware_utcnow
 from ...models import OutstandingToken
 
@@ -7,4 +9,8 @@ class Command(BaseCommand):
     help = "Стирает все истёкшие токены из базы данных"
 
     def handle(self, *args, **kwargs):
-        OutstandingToken.objects.filter(expires_at__lte=aware_utcnow()).delete()
+        now = aware_utcnow()
+        for db in token_databases(OutstandingToken):
+            OutstandingToken.objects.using(db).purge_expired(now)
+            # Таблицы периодов (TOKEN_BUCKET_PERIOD) удаляются целиком
+            drop_expired_buckets(db, now)
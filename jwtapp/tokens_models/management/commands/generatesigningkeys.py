@@ -0,0 +1,58 @@
+import json
+import os
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from jwtapp.backends import TokenBackend
+from jwtapp.exceptions import TokenBackendError
+from jwtapp.keys import ASYMMETRIC_ALGORITHMS, generate_key_pair, jwk_thumbprint, jwks_document
+
+
+class Command(BaseCommand):
+    help = ("Создаёт пару ключей для подписи токенов (EdDSA, ES*, RS*, PS*) и JWKS документ с открытым ключом. "
+            "Существующий JWKS дополняется, чтобы сервисы принимали токены старого ключа до его вывода")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--algorithm', choices=ASYMMETRIC_ALGORITHMS, default='EdDSA')
+        parser.add_argument('--output-dir', default='.', help='Каталог для <kid>.pem, <kid>.pub.pem и jwks.json')
+        parser.add_argument('--jwks', help='Путь к JWKS документу, по умолчанию <output-dir>/jwks.json')
+        parser.add_argument('--kid', help='Идентификатор ключа, по умолчанию отпечаток JWK (RFC 7638)')
+        parser.add_argument('--rsa-bits', type=int, default=2048)
+
+    def handle(self, *args, **options):
+        algorithm = options['algorithm']
+        try:
+            private_pem, public_pem = generate_key_pair(algorithm, options['rsa_bits'])
+            backend = TokenBackend(algorithm, private_pem, public_pem)
+            backend.validate_keys()
+            jwk = backend.public_jwk()
+        except TokenBackendError as ex:
+            raise CommandError(str(ex))
+        kid = options['kid'] or jwk_thumbprint(jwk)
+        jwk['kid'] = kid
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        private_path = output_dir / f'{kid}.pem'
+        public_path = output_dir / f'{kid}.pub.pem'
+        if private_path.exists():
+            raise CommandError(f'Файл {private_path} уже существует')
+        # Закрытый ключ доступен только владельцу
+        descriptor = os.open(private_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'w') as private_file:
+            private_file.write(private_pem)
+        public_path.write_text(public_pem)
+
+        jwks_path = Path(options['jwks']) if options['jwks'] else output_dir / 'jwks.json'
+        keys = json.loads(jwks_path.read_text())['keys'] if jwks_path.exists() else []
+        keys = [key for key in keys if key.get('kid') != kid] + [jwk]
+        jwks_path.write_text(json.dumps(jwks_document(keys), indent=4))
+
+        self.stdout.write(self.style.SUCCESS(f'Закрытый ключ: {private_path}\nОткрытый ключ: {public_path}\n'
+                                             f'JWKS ({len(keys)} ключей): {jwks_path}'))
+        self.stdout.write(
+            'Настройки JWTAPP:\n'
+            f"    'ALGORITHM': '{algorithm}',\n"
+            f"    'SIGNING_KEY': Path('{private_path}').read_text(),\n"
+            f"    'VERIFYING_KEY': Path('{public_path}').read_text(),\n"
+            f"    'SIGNING_KEY_ID': '{kid}',"
+        )
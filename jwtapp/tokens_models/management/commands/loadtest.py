@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from jwtapp.settings import api_settings
+from ..loadclient import parse_mix, run_client, summarize
+
+USERNAME_PREFIX = 'loadtest-'
+
+
+class Command(BaseCommand):
+    help = ("Нагрузочный тест эндпоинтов токенов: запускает приложение (WSGI или ASGI), создаёт пользователей "
+            "и выполняет смесь входов, запросов с JWT и ротаций из нескольких процессов. Результат в JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                            help='wsgi: gunicorn, если установлен, иначе runserver; asgi: uvicorn')
+        parser.add_argument('--server-workers', type=int, default=4)
+        parser.add_argument('--sqlite', action='store_true', help='SQLite база (jwtaccess.settings_loadtest)')
+        parser.add_argument('--url', help='Адрес уже запущенного сервера, например http://127.0.0.1:8077')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--password', default='loadtest-password')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Число процессов-клиентов')
+        parser.add_argument('--duration', type=float, default=30, help='Длительность в секундах')
+        parser.add_argument('--mix', default='login=1,users=4,sessions=2,rotate=1',
+                            help='Веса операций login, users, sessions, rotate')
+        parser.add_argument('-o', '--output', help='Файл для JSON результата, по умолчанию stdout')
+        parser.add_argument('--seed-only', action='store_true', help=argparse.SUPPRESS)
+
+    def seed_users(self, count, password):
+        """
+        Создаёт пользователей loadtest-<n> с одним хешем пароля, существующие не меняются
+        """
+        user_model = get_user_model()
+        encoded = make_password(password)
+        user_model.objects.bulk_create(
+            (user_model(username=f'{USERNAME_PREFIX}{number}', password=encoded) for number in range(count)),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+    def server_command(self, server, host, port, workers):
+        if server == 'asgi':
+            if find_spec('uvicorn') is None:
+                raise CommandError('Для ASGI сервера требуется пакет uvicorn')
+            return [sys.executable, '-m', 'uvicorn', 'jwtaccess.asgi:application', '--host', host,
+                    '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+        if find_spec('gunicorn') is not None:
+            return [sys.executable, '-m', 'gunicorn', 'jwtaccess.wsgi:application',
+                    '--bind', f'{host}:{port}', '--workers', str(workers)]
+        return [sys.executable, 'manage.py', 'runserver', '--noreload', f'{host}:{port}']
+
+    def wait_for_server(self, server, host, port, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Сервер завершился с кодом {server.returncode}')
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError('Сервер не начал принимать соединения')
+
+    def start_server(self, options, host, port):
+        """
+        Применяет миграции, создаёт пользователей и запускает сервер в отдельном процессе
+        """
+        settings_module = 'jwtaccess.settings_loadtest' if options['sqlite'] else os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'jwtaccess.settings')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+        manage = [sys.executable, 'manage.py']
+        subprocess.run([*manage, 'migrate', '--noinput', '-v', '0'], env=env, cwd=settings.BASE_DIR, check=True)
+        subprocess.run(
+            [*manage, 'loadtest', '--seed-only', '--users', str(options['users']), '--password', options['password']],
+            env=env, cwd=settings.BASE_DIR, check=True,
+        )
+        server = subprocess.Popen(
+            self.server_command(options['server'], host, port, options['server_workers']),
+            env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_server(server, host, port)
+        except CommandError:
+            server.terminate()
+            raise
+        return server
+
+    def handle(self, *args, **options):
+        if options['seed_only']:
+            self.seed_users(options['users'], options['password'])
+            return
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        throttled = (
+            api_settings.TOKEN_OBTAIN_IP_RATE, api_settings.TOKEN_OBTAIN_USERNAME_RATE,
+            api_settings.TOKEN_OBTAIN_MAX_CONCURRENT,
+        )
+        if not options['sqlite'] and any(throttled):
+            # Клиенты входят с одного адреса: сервер с этими настройками ответит 429/503 на большую часть входов
+            self.stderr.write(self.style.WARNING(
+                'Ограничение входа включено (TOKEN_OBTAIN_IP_RATE, TOKEN_OBTAIN_USERNAME_RATE, '
+                'TOKEN_OBTAIN_MAX_CONCURRENT): для замера запустите сервер с None в этих настройках'
+            ))
+
+        server = None
+        if options['url']:
+            url = urlsplit(options['url'])
+            host, port = url.hostname, url.port or 80
+            self.seed_users(options['users'], options['password'])
+        else:
+            host, port = '127.0.0.1', options['port']
+            server = self.start_server(options, host, port)
+
+        usernames = [f'{USERNAME_PREFIX}{number}' for number in range(options['users'])]
+        processes = options['processes']
+        duration = options['duration']
+        try:
+            started = time.monotonic()
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [
+                    executor.submit(run_client, host, port, usernames[number::processes] or usernames,
+                                    options['password'], mix, duration, number)
+                    for number in range(processes)
+                ]
+                results = [future.result() for future in futures]
+            elapsed = time.monotonic() - started
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        report = {
+            'server': 'external' if options['url'] else options['server'],
+            'database': 'sqlite' if options['sqlite'] else settings.DATABASES['default']['ENGINE'],
+            'processes': processes,
+            'users': options['users'],
+            'mix': mix,
+            'duration': round(elapsed, 2),
+            'endpoints': summarize(results, elapsed),
+        }
+        output = json.dumps(report, indent=4)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
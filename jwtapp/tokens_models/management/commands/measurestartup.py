@@ -0,0 +1,91 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from jwtapp.settings import api_settings
+from jwtapp.tokens import AccessToken
+
+# Выполняется в отдельном процессе: холодный запуск Django и первая аутентификация по JWT
+CHILD_SCRIPT = '''
+import json, os, sys, time
+started = time.perf_counter()
+from django.conf import settings
+settings.JWTAPP = {**getattr(settings, 'JWTAPP', {}), 'WARM_UP_ON_READY': False}
+import django
+django.setup()
+result = {'setup_ms': (time.perf_counter() - started) * 1000}
+
+mark = time.perf_counter()
+if os.environ['JWTAPP_STARTUP_WARM'] == '1':
+    from jwtapp.warmup import warm_up
+    warm_up(connect=True)
+result['warm_up_ms'] = (time.perf_counter() - mark) * 1000
+
+from django.test import RequestFactory
+from rest_framework.request import Request
+from jwtapp.authentication import JWTAuthentication
+from jwtapp.exceptions import AuthenticationFailed
+
+def authenticate():
+    mark = time.perf_counter()
+    request = Request(RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer ' + os.environ['JWTAPP_STARTUP_TOKEN']))
+    try:
+        JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        pass
+    return (time.perf_counter() - mark) * 1000
+
+result['first_request_ms'] = authenticate()
+result['second_request_ms'] = authenticate()
+result['total_ms'] = (time.perf_counter() - started) * 1000
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = ("Измеряет время холодного запуска процесса и задержку первой аутентификации по JWT "
+            "без прогрева и с jwtapp.warmup.warm_up")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Число запусков на режим')
+        parser.add_argument('--json', action='store_true', help='Вывод в JSON')
+
+    def run_child(self, token, warm):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'jwtaccess.settings'),
+            'JWTAPP_STARTUP_TOKEN': token,
+            'JWTAPP_STARTUP_WARM': '1' if warm else '0',
+        }
+        completed = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(completed.stderr)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        user_id = get_user_model().objects.values_list(api_settings.USER_ID_FIELD, flat=True).first()
+        token = AccessToken()
+        token[api_settings.USER_ID_CLAIM] = user_id if user_id is not None else 0
+        token = str(token)
+
+        results = {}
+        for mode, warm in (('cold', False), ('warm', True)):
+            runs = [self.run_child(token, warm) for _ in range(options['runs'])]
+            results[mode] = {
+                metric: round(statistics.median(run[metric] for run in runs), 2) for metric in runs[0]
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=4))
+            return
+        metrics = list(results['cold'])
+        self.stdout.write(f'{"медиана, мс":<20}' + ''.join(f'{mode:>12}' for mode in results))
+        for metric in metrics:
+            self.stdout.write(f'{metric:<20}' + ''.join(f'{results[mode][metric]:>12}' for mode in results))
@@ -0,0 +1,123 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.core.management.base import BaseCommand
+from jwtapp.buckets import token_model_pairs
+from jwtapp.settings import api_settings
+from jwtapp.sharding import database_for_payload
+from jwtapp.state import token_backend
+from jwtapp.exceptions import TokenBackendError
+from jwtapp.tokens import AccessToken
+from jwtapp.utils import datetime_to_epoch
+from ...models import SessionCutoff
+from ..streams import iter_tokens, open_input
+
+
+def decode_token(raw_token):
+    """
+    Проверяет подпись и срок действия токена. Выполняется в процессах пула
+    """
+    try:
+        return raw_token, token_backend.decode(raw_token), None
+    except TokenBackendError:
+        pass
+    try:
+        # Подпись верна, но срок истёк - отдельный вердикт
+        payload = token_backend.decode(raw_token, verify_exp=False)
+    except TokenBackendError as err:
+        return raw_token, None, str(err)
+    return raw_token, payload, 'expired'
+
+
+class Command(BaseCommand):
+    help = "Проверяет токены из файла или stdin и выводит вердикт по каждому в формате JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Файл с токенами, "-" - stdin')
+        parser.add_argument('--field', help='Поле с токеном, если вход в формате JSONL')
+        parser.add_argument('--workers', type=int, default=None, help='Число процессов для проверки подписи')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Размер пачки для проверки по чёрному списку')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        with open_input(options['path']) as source, ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            tokens = iter_tokens(source, options['field'])
+            while True:
+                # Пачками, чтобы память не росла с размером входа
+                chunk = list(islice(tokens, chunk_size))
+                if not chunk:
+                    break
+                results = list(executor.map(decode_token, chunk, chunksize=max(1, chunk_size // 32)))
+                self.write_verdicts(results)
+
+    def blacklisted_jtis(self, payloads):
+        """
+        JTI из чёрного списка: один запрос IN (...) на пачку и шард
+        """
+        by_db = {}
+        for payload in payloads:
+            jti = payload.get(api_settings.JTI_CLAIM)
+            if jti is not None:
+                by_db.setdefault(database_for_payload(payload), []).append(jti)
+        blacklisted = set()
+        for db, jtis in by_db.items():
+            for _, blacklisted_model in token_model_pairs(db):
+                blacklisted.update(
+                    blacklisted_model.objects.using(db).filter(token__jti__in=jtis).values_list('token__jti', flat=True)
+                )
+        return blacklisted
+
+    def session_cutoffs(self, payloads):
+        """
+        Моменты завершения всех сессий (SessionCutoff) пользователей пачки: один запрос на шард.
+        Ключ - (шард, идентификатор пользователя строкой), значение - epoch
+        """
+        by_db = {}
+        for payload in payloads:
+            user_id = payload.get(api_settings.USER_ID_CLAIM)
+            if user_id is not None:
+                by_db.setdefault(database_for_payload(payload), set()).add(str(user_id))
+        cutoffs = {}
+        for db, user_ids in by_db.items():
+            rows = SessionCutoff.objects.using(db).filter(user_id__in=user_ids).values_list('user_id', 'revoked_before')
+            cutoffs.update(((db, user_id), datetime_to_epoch(revoked_before)) for user_id, revoked_before in rows)
+        return cutoffs
+
+    def is_cut_off(self, payload, cutoffs):
+        """
+        Токен выдан не позже завершения всех сессий пользователя. Access токены при этом не отклоняются
+        (действуют до "exp", только не продлеваются), поэтому для них вердикт не меняется
+        """
+        if payload.get(api_settings.TOKEN_TYPE_CLAIM) == AccessToken.token_type or 'iat' not in payload:
+            return False
+        user_id = payload.get(api_settings.USER_ID_CLAIM)
+        revoked_before = cutoffs.get((database_for_payload(payload), str(user_id)))
+        return revoked_before is not None and payload['iat'] <= revoked_before
+
+    def write_verdicts(self, results):
+        payloads = [payload for _, payload, _ in results if payload is not None]
+        blacklisted = self.blacklisted_jtis(payloads)
+        cutoffs = self.session_cutoffs(payloads)
+        for raw_token, payload, error in results:
+            verdict = {'token': raw_token}
+            if payload is None:
+                verdict.update(status='invalid', error=error)
+            else:
+                jti = payload.get(api_settings.JTI_CLAIM)
+                if jti in blacklisted:
+                    status = 'blacklisted'
+                elif self.is_cut_off(payload, cutoffs):
+                    status = 'revoked'
+                elif error == 'expired':
+                    status = 'expired'
+                else:
+                    status = 'valid'
+                verdict.update(
+                    status=status,
+                    jti=jti,
+                    user_id=payload.get(api_settings.USER_ID_CLAIM),
+                    token_type=payload.get(api_settings.TOKEN_TYPE_CLAIM),
+                    exp=payload.get('exp'),
+                )
+            self.stdout.write(json.dumps(verdict, ensure_ascii=False))
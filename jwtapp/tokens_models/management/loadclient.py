@@ -0,0 +1,136 @@
+import json
+import random
+import socket
+import time
+from http.client import HTTPConnection, HTTPException
+
+# Операции нагрузочного теста: метод, путь, ожидаемый статус
+OPERATIONS = {
+    'login': ('POST', '/api/token/', 200),
+    'users': ('GET', '/auth/api/user_create/?fields=id,username', 200),
+    'sessions': ('GET', '/api/token/sessions/', 200),
+    'rotate': ('POST', '/api/token/rotated/', 200),
+}
+
+
+def parse_mix(value):
+    """
+    'login=1,users=4' -> {'login': 1.0, 'users': 4.0}
+    """
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'Неизвестная операция "{name}", доступны: {", ".join(OPERATIONS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return round(values[index], 2)
+
+
+def summarize(results, duration):
+    """
+    Сводка по операциям: запросы в секунду, p50/p95/p99 задержки в мс, доля ошибок
+    """
+    summary = {}
+    for name in OPERATIONS:
+        latencies = [latency for result in results for latency in result[name]['latencies']]
+        errors = sum(result[name]['errors'] for result in results)
+        statuses = {}
+        for result in results:
+            for status, count in result[name]['statuses'].items():
+                statuses[status] = statuses.get(status, 0) + count
+        total = len(latencies)
+        if not total:
+            continue
+        summary[name] = {
+            'requests': total,
+            'throughput': round(total / duration, 2),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'error_rate': round(errors / total, 4),
+            'statuses': statuses,
+        }
+    return summary
+
+
+class LoadClient:
+    """
+    Клиент одного процесса: одно keep-alive соединение, токены своих пользователей
+    """
+
+    def __init__(self, host, port, usernames, password, timeout=30):
+        self.host = host
+        self.port = port
+        self.usernames = usernames
+        self.password = password
+        self.timeout = timeout
+        self.connection = None
+        self.tokens = {}
+        self.stats = {name: {'latencies': [], 'errors': 0, 'statuses': {}} for name in OPERATIONS}
+
+    def request(self, name, body=None, token=None):
+        method, path, expected = OPERATIONS[name]
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = json.dumps(body) if body is not None else None
+        stats = self.stats[name]
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = str(response.status)
+        except (HTTPException, OSError, socket.timeout):
+            self.connection.close()
+            self.connection = None
+            data, status = None, 'connection_error'
+        stats['latencies'].append((time.perf_counter() - started) * 1000)
+        stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+        if status != str(expected):
+            stats['errors'] += 1
+            return None
+        return json.loads(data) if data else {}
+
+    def run(self, name, username):
+        if name == 'login' or username not in self.tokens:
+            data = self.request('login', {'username': username, 'password': self.password})
+            if data:
+                self.tokens[username] = data
+            return
+        tokens = self.tokens[username]
+        if name == 'rotate':
+            data = self.request('rotate', {'refresh': tokens['refresh']})
+            if data:
+                tokens.update(data)
+            else:
+                # Токен мог быть отозван после ошибки: следующий запрос начнётся со входа
+                del self.tokens[username]
+            return
+        self.request(name, token=tokens['access'])
+
+
+def run_client(host, port, usernames, password, mix, duration, seed):
+    """
+    Точка входа процесса-клиента: выполняет случайные операции из mix в течение duration секунд
+    """
+    rng = random.Random(seed)
+    client = LoadClient(host, port, usernames, password)
+    names, weights = zip(*mix.items())
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        client.run(rng.choices(names, weights)[0], rng.choice(usernames))
+    if client.connection is not None:
+        client.connection.close()
+    return client.stats
@@ -0,0 +1,33 @@
+import json
+import sys
+from contextlib import contextmanager
+
+
+@contextmanager
+def open_input(path):
+    """
+    Открывает файл с токенами, "-" - stdin
+    """
+    if path == '-':
+        yield sys.stdin
+        return
+    with open(path, encoding='utf-8') as source:
+        yield source
+
+
+def iter_tokens(lines, field=None):
+    """
+    Токены по одному на строку, либо значение поля field из строк JSONL
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if field:
+            try:
+                line = json.loads(line).get(field)
+            except (ValueError, AttributeError):
+                line = None
+            if not line:
+                continue
+        yield line
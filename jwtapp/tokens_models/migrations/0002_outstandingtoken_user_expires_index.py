@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-18 23:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tokens_models', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='outstandingtoken',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='outstandingtoken',
+            index=models.Index(fields=['user', 'expires_at'], name='outstanding_user_expires_idx'),
+        ),
+    ]
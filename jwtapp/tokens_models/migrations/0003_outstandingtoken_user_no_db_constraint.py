@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-18 23:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tokens_models', '0002_outstandingtoken_user_expires_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outstandingtoken',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-18 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tokens_models', '0003_outstandingtoken_user_no_db_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event', models.CharField(max_length=32)),
+                ('jti', models.CharField(blank=True, max_length=255)),
+                ('user_id', models.CharField(blank=True, max_length=255)),
+                ('token_type', models.CharField(blank=True, max_length=32)),
+                ('detail', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tokens_models', '0004_auditevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outstandingtoken',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.13 on 2026-10-18 23:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tokens_models', '0005_outstandingtoken_expires_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blacklistedtoken',
+            name='blacklisted_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
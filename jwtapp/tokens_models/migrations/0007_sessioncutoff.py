@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-19 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tokens_models', '0006_blacklistedtoken_blacklisted_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionCutoff',
+            fields=[
+                ('user_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('revoked_before', models.DateTimeField()),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -1,18 +1,107 @@
 from django.conf import settings
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.constants import OnConflict
+from jwtapp.audit import audit, get_audit_log
+from jwtapp.routers import remember_user_ids
+from jwtapp.settings import api_settings
+from jwtapp.utils import aware_utcnow
+
+
+class OutstandingTokenQuerySet(models.QuerySet):
+    def blacklisted_model(self):
+        """
+        Модель черного списка для таблицы выборки (основной или таблицы периода)
+        """
+        return self.model._meta.get_field('blacklistedtoken').related_model
+
+    def alive(self, now=None):
+        """
+        Незавершенные токены: срок действия не истёк и токен не в черном списке
+        """
+        if now is None:
+            now = aware_utcnow()
+        return self.filter(expires_at__gt=now, blacklistedtoken__isnull=True)
+
+    def blacklist(self):
+        """
+        Добавляет все токены выборки в черный список одним запросом INSERT ... SELECT.
+        Токены, которые одновременно отозвал другой запрос, пропускаются (ON CONFLICT DO NOTHING,
+        INSERT OR IGNORE на SQLite). Возвращает количество добавленных записей
+        """
+        db = self._db or router.db_for_write(self.model)
+        tokens = self.filter(blacklistedtoken__isnull=True).order_by()
+        audited = get_audit_log() is not None
+        pinned = api_settings.READ_REPLICA_DATABASE and api_settings.USER_ID_FIELD in ('id', 'pk')
+        if audited or pinned:
+            # Для журнала аудита нужны jti, для закрепления за основной БД - пользователи (post_save нет):
+            # выборка читается до вставки
+            rows = list(tokens.using(db).values_list('id', 'jti', 'user_id'))
+            if not rows:
+                return 0
+            tokens = self.model.objects.filter(id__in=[row[0] for row in rows])
+        subquery, params = tokens.values('id').query.get_compiler(using=db).as_sql()
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        blacklisted_table = quote(self.blacklisted_model()._meta.db_table)
+        outstanding_table = quote(self.model._meta.db_table)
+        sql = (
+            f'{connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)} {blacklisted_table} '
+            f'({quote("token_id")}, {quote("blacklisted_at")}) '
+            f'SELECT {quote("id")}, %s FROM {outstanding_table} WHERE {quote("id")} IN ({subquery}) '
+            f'{connection.ops.on_conflict_suffix_sql(None, OnConflict.IGNORE, None, None)}'
+        )
+        blacklisted_at = connection.ops.adapt_datetimefield_value(aware_utcnow())
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (blacklisted_at, *params))
+            added = cursor.rowcount
+        if audited:
+            for _, jti, user_id in rows:
+                audit('blacklisted', jti=jti, user_id=user_id)
+        if pinned:
+            remember_user_ids(user_id for _, _, user_id in rows)
+        return added
+
+    def purge_expired(self, now=None):
+        """
+        Удаляет истёкшие токены и их записи в черном списке двумя запросами DELETE без загрузки
+        объектов в Python. Возвращает количество удалённых токенов
+        """
+        if now is None:
+            now = aware_utcnow()
+        db = self._db or router.db_for_write(self.model)
+        connection = connections[db]
+        quote = connection.ops.quote_name
+        blacklisted_table = quote(self.blacklisted_model()._meta.db_table)
+        outstanding_table = quote(self.model._meta.db_table)
+        expires_at = connection.ops.adapt_datetimefield_value(now)
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {blacklisted_table} WHERE {quote("token_id")} IN '
+                f'(SELECT {quote("id")} FROM {outstanding_table} WHERE {quote("expires_at")} <= %s)',
+                (expires_at,),
+            )
+            cursor.execute(f'DELETE FROM {outstanding_table} WHERE {quote("expires_at")} <= %s', (expires_at,))
+            return cursor.rowcount
 
 
 class OutstandingToken(models.Model):
     id = models.BigAutoField(primary_key=True, serialize=False)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    # Без ограничения в БД: при шардировании (TOKEN_SHARDS) пользователи хранятся в другой БД
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False,
+    )
     jti = models.CharField(unique=True, max_length=255)
     token = models.TextField()
     created_at = models.DateTimeField(null=True, blank=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = OutstandingTokenQuerySet.as_manager()
 
     class Meta:
         abstract = 'jwtapp.tokens_models' not in settings.INSTALLED_APPS
-        ordering = ('user',)
+        indexes = [
+            models.Index(fields=('user', 'expires_at'), name='outstanding_user_expires_idx'),
+        ]
 
     def __str__(self):
         return f'Токен пользователя: {self.user} ({self.jti})'
@@ -21,10 +110,41 @@ class OutstandingToken(models.Model):
 class BlacklistedToken(models.Model):
     id = models.BigAutoField(primary_key=True, serialize=False)
     token = models.OneToOneField(OutstandingToken, on_delete=models.CASCADE)
-    blacklisted_at = models.DateTimeField(auto_now_add=True)
+    blacklisted_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         abstract = 'jwtapp.tokens_models' not in settings.INSTALLED_APPS
 
     def __str__(self):
         return f'Токен из черного списка пользователя: {self.token.user}'
+
+
+class SessionCutoff(models.Model):
+    """
+    Завершение всех сессий пользователя: токены, выданные не позже revoked_before, отозваны.
+    Хранится в шарде токенов пользователя
+    """
+    user_id = models.CharField(primary_key=True, max_length=255)
+    revoked_before = models.DateTimeField()
+
+    class Meta:
+        abstract = 'jwtapp.tokens_models' not in settings.INSTALLED_APPS
+
+    def __str__(self):
+        return f'Сессии пользователя {self.user_id} завершены {self.revoked_before}'
+
+
+class AuditEvent(models.Model):
+    id = models.BigAutoField(primary_key=True, serialize=False)
+    event = models.CharField(max_length=32)
+    jti = models.CharField(max_length=255, blank=True)
+    user_id = models.CharField(max_length=255, blank=True)
+    token_type = models.CharField(max_length=32, blank=True)
+    detail = models.TextField(blank=True)
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        abstract = 'jwtapp.tokens_models' not in settings.INSTALLED_APPS
+
+    def __str__(self):
+        return f'{self.event} ({self.jti})'
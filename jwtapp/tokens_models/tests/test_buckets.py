@@ -0,0 +1,194 @@
+import os
+import time
+import traceback
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from jwtapp import buckets
+from jwtapp.exceptions import TokenError
+from jwtapp.tokens import RefreshToken
+from jwtapp.utils import FrozenClock, datetime_from_epoch, set_clock
+from ..models import OutstandingToken
+
+User = get_user_model()
+
+PERIOD = 3600
+START = 1900000000
+
+
+@override_settings(JWTAPP={**settings.JWTAPP, 'TOKEN_BUCKET_PERIOD': timedelta(seconds=PERIOD)})
+class TokenBucketTests(TransactionTestCase):
+    """
+    Таблицы периодов создаются схемой во время запроса, поэтому тесты без обёртки в транзакцию
+    """
+
+    def setUp(self):
+        self.clock = FrozenClock(START)
+        self.previous_clock = set_clock(self.clock)
+        self.user = User.objects.create_user(username='alice', password='password')
+
+    def tearDown(self):
+        buckets.drop_expired_buckets('default', datetime_from_epoch(START + 365 * 86400))
+        buckets._existing_tables.clear()
+        buckets._bucket_lists.clear()
+        set_clock(self.previous_clock)
+
+    def bucket_rows(self):
+        return [
+            row for number in buckets.existing_buckets('default')
+            for row in buckets.get_bucket_models(number)[0].objects.all()
+        ]
+
+    def test_token_is_written_to_its_bucket(self):
+        token = RefreshToken.for_user(self.user)
+        number = buckets.bucket_for(token['exp'])
+        self.assertEqual(buckets.existing_buckets('default'), [number])
+        self.assertFalse(OutstandingToken.objects.exists())
+        outstanding, _ = buckets.get_bucket_models(number)
+        self.assertTrue(outstanding.objects.filter(jti=token['jti'], user_id=self.user.pk).exists())
+
+    @override_settings(JWTAPP={
+        **settings.JWTAPP, 'TOKEN_BUCKET_PERIOD': timedelta(seconds=PERIOD), 'TRACK_OUTSTANDING_TOKENS': False,
+    })
+    def test_blacklisted_token_in_new_bucket_is_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        token.check_blacklist()
+        self.assertFalse(buckets.bucket_exists(buckets.bucket_for(token['exp']), 'default'))
+
+        token.blacklist()
+        # Процесс, который уже проверял токен до создания таблицы периода
+        buckets._existing_tables.clear()
+        buckets._bucket_lists.clear()
+        with self.assertRaises(TokenError):
+            token.check_blacklist()
+
+    @override_settings(JWTAPP={
+        **settings.JWTAPP, 'TOKEN_BUCKET_PERIOD': timedelta(seconds=PERIOD), 'TRACK_OUTSTANDING_TOKENS': False,
+    })
+    def test_missing_bucket_check_probes_one_table(self):
+        token = RefreshToken.for_user(self.user)
+        with mock.patch.object(connection.introspection, 'table_names', side_effect=AssertionError), \
+                CaptureQueriesContext(connection) as queries:
+            token.check_blacklist()
+            token.check_blacklist()
+        probes = [query['sql'] for query in queries if 'sqlite_master' in query['sql']]
+        # Отсутствие таблицы не кешируется: каждая проверка спрашивает каталог заново, но только о ней
+        self.assertEqual(len(probes), 2)
+
+    def test_session_list_pages_across_buckets(self):
+        OutstandingToken.objects.create(
+            user=self.user, jti='before-buckets', token='', expires_at=datetime_from_epoch(START + 86400),
+        )
+        for _ in range(3):
+            RefreshToken.for_user(self.user)
+            RefreshToken.for_user(self.user)
+            self.clock.advance(PERIOD)
+        access = RefreshToken.for_user(self.user).access_token
+        self.assertEqual(len(buckets.existing_buckets('default')), 4)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        url, jtis, pages = '/api/token/sessions/?page_size=3', [], 0
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.data['previous'])
+            jtis.extend(session['jti'] for session in response.data['results'])
+            url = response.data['next']
+            pages += 1
+
+        rows = sorted(self.bucket_rows(), key=lambda row: (row.bucket, row.id), reverse=True)
+        self.assertEqual(pages, 3)
+        self.assertEqual(jtis, [row.jti for row in rows] + ['before-buckets'])
+
+    def test_invalid_cursor(self):
+        access = RefreshToken.for_user(self.user).access_token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(client.get('/api/token/sessions/?cursor=cD0x').status_code, 404)
+
+    def test_flushexpiredtokens_drops_expired_buckets(self):
+        RefreshToken.for_user(self.user)
+        self.clock.advance(PERIOD)
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(len(buckets.existing_buckets('default', cached=True)), 2)
+
+        self.clock.advance(86400)
+        call_command('flushexpiredtokens')
+        self.assertEqual(buckets.existing_buckets('default', cached=True), [buckets.bucket_for(token['exp'])])
+        tables = connection.introspection.table_names()
+        self.assertEqual([table for table in tables if table.startswith('tokens_models_outstandingtoken_')], [
+            f'tokens_models_outstandingtoken_{buckets.bucket_for(token["exp"])}',
+        ])
+
+
+@override_settings(JWTAPP={
+    **settings.JWTAPP, 'TOKEN_BUCKET_PERIOD': timedelta(seconds=PERIOD), 'TOKEN_SHARDS': ('shared',),
+})
+@skipUnless(hasattr(os, 'fork'), 'нужен os.fork')
+class TokenBucketProcessTests(TransactionTestCase):
+    """
+    Несколько процессов-воркеров пишут токены в одну таблицу периода
+    """
+    databases = {'default', 'shared'}
+    workers = 4
+    rows_per_worker = 200
+
+    def setUp(self):
+        self.previous_clock = set_clock(FrozenClock(START))
+        self.user = User.objects.create_user(username='alice', password='password')
+
+    def tearDown(self):
+        buckets.drop_expired_buckets('shared', datetime_from_epoch(START + 365 * 86400))
+        buckets._existing_tables.clear()
+        buckets._bucket_lists.clear()
+        set_clock(self.previous_clock)
+
+    def test_ids_unique_across_forked_workers(self):
+        token = RefreshToken.for_user(self.user)
+        outstanding, _ = buckets.get_bucket_models(buckets.bucket_for(token['exp']))
+        expires_at = datetime_from_epoch(token['exp'])
+        # Соединение SQLite не переживает fork: каждый воркер открывает своё
+        connections['shared'].close()
+        start_read, start_write = os.pipe()
+        pids = []
+        for worker in range(self.workers):
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    os.close(start_write)
+                    os.read(start_read, 1)
+                    # Строки без bcrypt из for_user, по одной в миллисекунду, как у воркеров под нагрузкой,
+                    # и одной пачкой, чтобы запись в SQLite не разводила воркеров по времени
+                    rows = []
+                    for number in range(self.rows_per_worker):
+                        tick = time.time_ns() // 1000000
+                        while time.time_ns() // 1000000 == tick:
+                            pass
+                        rows.append(outstanding(
+                            user_id=self.user.pk, jti=f'{worker}-{number}', token='', expires_at=expires_at,
+                        ))
+                    outstanding.objects.using('shared').bulk_create(rows)
+                    connections['shared'].close()
+                    code = 0
+                except Exception:
+                    traceback.print_exc()
+                finally:
+                    os._exit(code)
+            pids.append(pid)
+        os.close(start_read)
+        os.write(start_write, b'x' * self.workers)
+        os.close(start_write)
+        statuses = [os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) for pid in pids]
+        self.assertEqual(statuses, [0] * self.workers)
+
+        ids = list(outstanding.objects.using('shared').values_list('id', flat=True))
+        self.assertEqual(len(ids), self.workers * self.rows_per_worker + 1)
+        self.assertEqual(len(set(ids)), len(ids))
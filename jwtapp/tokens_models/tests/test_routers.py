@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from jwtapp import routers
+from jwtapp.exceptions import TokenError
+from jwtapp.tokens import RefreshToken, revoke_all_sessions
+from ..models import BlacklistedToken, OutstandingToken
+
+User = get_user_model()
+
+
+@override_settings(JWTAPP={**settings.JWTAPP, 'READ_REPLICA_DATABASE': 'replica'})
+class ReadReplicaRouterTests(TestCase):
+    """
+    'default' и 'replica' - разные SQLite базы без репликации: по наличию записи видно, куда ушло чтение
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        routers._recent_writes.clear()
+        self.user = self.create_replicated_user('alice')
+        self.other = self.create_replicated_user('bob')
+        routers._recent_writes.clear()
+        routers.reset_pin()
+
+    def create_replicated_user(self, username):
+        user = User.objects.create_user(username=username, password='password')
+        user.save(using='replica')
+        return user
+
+    def test_reads_go_to_replica(self):
+        User.objects.using('default').filter(pk=self.user.pk).update(first_name='primary')
+        self.assertEqual(User.objects.get(pk=self.user.pk).first_name, '')
+
+    def test_write_pins_current_request(self):
+        user = User.objects.create_user(username='carol', password='password')
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+    def test_pin_does_not_leak_into_next_request(self):
+        user = User.objects.create_user(username='carol', password='password')
+        request_started.send(sender=self.__class__)
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+
+    def test_pin_follows_written_user(self):
+        user = User.objects.create_user(username='carol', password='password')
+        request_started.send(sender=self.__class__)
+        routers.pin_user(self.other.pk)
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        routers.pin_user(user.pk)
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+    def test_login_does_not_pin_other_users(self):
+        # Токен bob выпущен в основную БД, но не в этом процессе недавно: его сессии читаются с реплики
+        bob_access = RefreshToken.for_user(self.other).access_token
+        routers._recent_writes.clear()
+
+        client = APIClient()
+        response = client.post('/api/token/', {'username': 'alice', 'password': 'password'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        response = client.get('/api/token/sessions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {bob_access}')
+        response = client.get('/api/token/sessions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def replicate_tokens(self):
+        for token in OutstandingToken.objects.using('default').all():
+            token.save(using='replica')
+        routers._recent_writes.clear()
+
+    def assertRevokedInNextRequest(self, raw_token):
+        request_started.send(sender=self.__class__)
+        with self.assertRaises(TokenError):
+            RefreshToken(raw_token)
+
+    def test_rotated_token_is_rejected_in_next_request(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        self.replicate_tokens()
+
+        response = APIClient().post('/api/token/rotated/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # На реплике записи черного списка нет: проверка должна читать основную БД
+        self.assertFalse(BlacklistedToken.objects.using('replica').exists())
+        self.assertRevokedInNextRequest(refresh)
+
+    def test_bulk_blacklist_is_rejected_in_next_request(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        self.replicate_tokens()
+
+        self.assertEqual(OutstandingToken.objects.filter(user_id=self.user.pk).blacklist(), 1)
+        self.assertRevokedInNextRequest(refresh)
+
+    def test_revoke_all_sessions_is_rejected_in_next_request(self):
+        refresh = RefreshToken.for_user(self.user)
+        self.replicate_tokens()
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        response = client.post('/api/token/sessions/revoke/')
+        self.assertEqual(response.data, {'blacklisted': 1})
+        self.assertRevokedInNextRequest(str(refresh))
+
+    @override_settings(JWTAPP={
+        **settings.JWTAPP, 'READ_REPLICA_DATABASE': 'replica', 'TRACK_OUTSTANDING_TOKENS': False,
+    })
+    def test_session_cutoff_is_read_from_primary_in_next_request(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        revoke_all_sessions(self.user)
+        self.assertRevokedInNextRequest(refresh)
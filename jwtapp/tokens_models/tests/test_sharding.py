@@ -0,0 +1,96 @@
+from uuid import uuid4
+from zlib import crc32
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from jwtapp.revocation import RevocationFeed
+from jwtapp.sharding import database_for_payload, database_for_user, shard_for
+from jwtapp.tokens import RefreshToken
+from ..models import BlacklistedToken, OutstandingToken, SessionCutoff
+
+User = get_user_model()
+
+SHARDS = ('shard0', 'shard1')
+
+
+@override_settings(JWTAPP={**settings.JWTAPP, 'TOKEN_SHARDS': SHARDS})
+class TokenShardTests(TestCase):
+    """
+    Пользователи в 'default', токены в 'shard0' и 'shard1' - отдельных SQLite базах
+    """
+    databases = {'default', *SHARDS}
+
+    def setUp(self):
+        self.users = {}
+        while len(self.users) < len(SHARDS):
+            user = User.objects.create_user(username=f'user-{uuid4().hex[:8]}', password='password')
+            self.users.setdefault(database_for_user(user), user)
+
+    def tokens_in(self, db, model=OutstandingToken):
+        return model.objects.using(db)
+
+    def test_database_for_user(self):
+        for db, user in self.users.items():
+            self.assertIn(db, SHARDS)
+            self.assertEqual(db, SHARDS[crc32(str(user.pk).encode()) % len(SHARDS)])
+            self.assertEqual(database_for_payload({'user_id': user.pk, 'jti': 'x'}), db)
+        # Токен без пользователя - по JTI
+        self.assertEqual(database_for_payload({'jti': 'x'}), shard_for('x'))
+
+    @override_settings(JWTAPP={**settings.JWTAPP, 'TOKEN_SHARDS': ()})
+    def test_sharding_disabled(self):
+        self.assertIsNone(database_for_user(self.users['shard0']))
+
+    def test_obtain_rotate_blacklist_on_shard(self):
+        db, other = 'shard1', 'shard0'
+        user = self.users[db]
+        client = APIClient()
+
+        response = client.post('/api/token/', {'username': user.username, 'password': 'password'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        jti = RefreshToken(response.data['refresh'])['jti']
+        self.assertTrue(self.tokens_in(db).filter(jti=jti, user_id=user.pk).exists())
+        self.assertFalse(self.tokens_in(other).filter(jti=jti).exists())
+        self.assertFalse(self.tokens_in('default').filter(jti=jti).exists())
+
+        refresh = response.data['refresh']
+        response = client.post('/api/token/rotated/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.tokens_in(db, BlacklistedToken).filter(token__jti=jti).exists())
+        self.assertFalse(self.tokens_in(other, BlacklistedToken).exists())
+        response = client.post('/api/token/rotated/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_revoke_all_sessions_on_shard(self):
+        db = 'shard0'
+        user = self.users[db]
+        tokens = [RefreshToken.for_user(user) for _ in range(3)]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens[0].access_token}')
+
+        response = client.get('/api/token/sessions/')
+        self.assertEqual(len(response.data['results']), 3)
+        response = client.post('/api/token/sessions/revoke/')
+        self.assertEqual(response.data, {'blacklisted': 3})
+        self.assertEqual(self.tokens_in(db, BlacklistedToken).count(), 3)
+        self.assertTrue(SessionCutoff.objects.using(db).filter(user_id=str(user.pk)).exists())
+        self.assertFalse(SessionCutoff.objects.using('shard1').exists())
+
+    def test_revocation_feed_reads_all_shards(self):
+        tokens = {db: [RefreshToken.for_user(user) for _ in range(2)] for db, user in self.users.items()}
+        for db in SHARDS:
+            tokens[db][0].blacklist()
+
+        feed = RevocationFeed(interval=60, max_batch=100, overlap=5)
+        for db in SHARDS:
+            self.assertTrue(feed.is_revoked(tokens[db][0]['jti']))
+            self.assertFalse(feed.is_revoked(tokens[db][1]['jti']))
+
+        # Отзыв в другом процессе: виден после следующего опроса по всем шардам
+        for db in SHARDS:
+            self.tokens_in(db).filter(jti=tokens[db][1]['jti']).blacklist()
+        feed._next_poll = 0
+        for db in SHARDS:
+            self.assertTrue(feed.is_revoked(tokens[db][1]['jti']))
+        self.assertEqual(feed.counters['resyncs'], 1)
@@ -0,0 +1,90 @@
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+from jwtapp.backends import CBOR_AVAILABLE, COSE_MAC0_TAG, TokenBackend, b64encode_nopad
+from jwtapp.exceptions import TokenBackendError
+from jwtapp.utils import epoch_now
+
+User = get_user_model()
+
+SECRET = 'test-secret-key-with-at-least-32-bytes'
+
+
+def cwt_message(*parts, tag=COSE_MAC0_TAG):
+    import cbor2
+    return b64encode_nopad(cbor2.dumps(cbor2.CBORTag(tag, list(parts))))
+
+
+def malformed_cwt_tokens():
+    import cbor2
+    header, claims = cbor2.dumps({1: 5}), cbor2.dumps({4: epoch_now() + 60})
+    return [
+        b64encode_nopad(cbor2.dumps(5)),
+        b64encode_nopad(cbor2.dumps([header, {}, claims, b'x'])),
+        cwt_message(cbor2.dumps([1]), {}, claims, b'x'),
+        cwt_message(header, {}, cbor2.dumps([1]), b'x'),
+        cwt_message(header, {}, claims, 5),
+        cwt_message(header, {}, claims),
+        cwt_message(5, {}, claims, b'x'),
+        b64encode_nopad(cbor2.dumps(cbor2.CBORTag(COSE_MAC0_TAG, 'abcd'))),
+        b64encode_nopad(b'\xff\xff'),
+        'not~base64',
+    ]
+
+
+class TokenFormatTests(SimpleTestCase):
+    """
+    Форматы jwt, compact и cwt: кодирование и отказ с TokenBackendError на повреждённых токенах
+    """
+
+    def setUp(self):
+        self.backend = TokenBackend('HS256', SECRET)
+        self.payload = {'token_type': 'access', 'exp': epoch_now() + 60, 'jti': 'a' * 32, 'user_id': 1}
+
+    def assertRejected(self, token):
+        for verify in (True, False):
+            with self.subTest(token=token, verify=verify), self.assertRaises(TokenBackendError):
+                self.backend.decode(token, verify=verify)
+
+    def formats(self):
+        return ('jwt', 'compact', 'cwt') if CBOR_AVAILABLE else ('jwt', 'compact')
+
+    def test_round_trip(self):
+        for token_format in self.formats():
+            with self.subTest(token_format=token_format):
+                token = self.backend.encode(self.payload, token_format)
+                self.assertEqual(self.backend.decode(token), self.payload)
+
+    def test_wrong_signature(self):
+        other = TokenBackend('HS256', SECRET[::-1])
+        for token_format in self.formats():
+            with self.subTest(token_format=token_format), self.assertRaises(TokenBackendError):
+                self.backend.decode(other.encode(self.payload, token_format))
+
+    def test_malformed_jwt(self):
+        for token in ('a.b.c', 'abc.def', '..', 'eyJhbGciOiJIUzI1NiJ9.WzFd.x'):
+            self.assertRejected(token)
+
+    def test_malformed_compact(self):
+        header, _, signature = self.backend.encode(self.payload, 'compact').split('.')
+        for body in ('WzFd', 'bm90IGpzb24', '!!!'):
+            self.assertRejected(f'{header}.{body}.{signature}')
+
+    @skipUnless(CBOR_AVAILABLE, 'нужен cbor2')
+    def test_malformed_cwt(self):
+        token = self.backend.encode(self.payload, 'cwt')
+        self.assertRejected(token[:-4])
+        for token in malformed_cwt_tokens():
+            self.assertRejected(token)
+
+
+@skipUnless(CBOR_AVAILABLE, 'нужен cbor2')
+class MalformedBearerTests(TestCase):
+
+    def test_malformed_cwt_bearer_is_unauthorized(self):
+        client = APIClient()
+        for token in malformed_cwt_tokens():
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+            with self.subTest(token=token):
+                self.assertEqual(client.get('/auth/api/user_create/').status_code, 401)
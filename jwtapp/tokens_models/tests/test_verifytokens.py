@@ -0,0 +1,38 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from jwtapp.tokens import RefreshToken, revoke_all_sessions
+
+User = get_user_model()
+
+
+@override_settings(JWTAPP={**settings.JWTAPP, 'TRACK_OUTSTANDING_TOKENS': False})
+class VerifyTokensTests(TestCase):
+
+    def verify(self, *tokens):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as source:
+            source.write('\n'.join(str(token) for token in tokens))
+        out = StringIO()
+        call_command('verifytokens', path, workers=1, stdout=out)
+        return {line['token']: line['status'] for line in map(json.loads, out.getvalue().splitlines())}
+
+    def test_tokens_before_session_cutoff_are_revoked(self):
+        user = User.objects.create_user(username='alice', password='password')
+        other = User.objects.create_user(username='bob', password='password')
+        refresh = RefreshToken.for_user(user)
+        access = refresh.access_token
+        other_refresh = RefreshToken.for_user(other)
+        revoke_all_sessions(user)
+
+        verdicts = self.verify(refresh, access, other_refresh)
+        self.assertEqual(verdicts[str(refresh)], 'revoked')
+        # Access токен не отклоняется до "exp"
+        self.assertEqual(verdicts[str(access)], 'valid')
+        self.assertEqual(verdicts[str(other_refresh)], 'valid')
@@ -1,17 +1,88 @@
+import time
 from calendar import timegm
-from datetime import datetime
+from datetime import datetime, timezone
 from django.conf import settings
-from django.utils.timezone import is_naive, make_aware, utc
+from django.utils.timezone import is_naive, make_aware
+
+
+class SystemClock:
+    """
+    Текущее время UTC в целых секундах epoch
+    """
+
+    def __call__(self):
+        return int(time.time())
+
+
+class CachedClock(SystemClock):
+    """
+    Системное время, которое пересчитывается не чаще раза в секунду
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.next_tick = 0.0
+
+    def __call__(self):
+        tick = time.monotonic()
+        if tick >= self.next_tick:
+            now = time.time()
+            self.now = int(now)
+            self.next_tick = tick + 1 - (now - self.now)
+        return self.now
+
+
+class FrozenClock:
+    """
+    Детерминированные часы для бенчмарков и проверок: время меняется только через advance()
+    """
+
+    def __init__(self, now=None):
+        self.now = int(time.time()) if now is None else int(now)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds=1):
+        self.now += int(seconds)
+        return self.now
+
+
+_clock = None
+
+
+def get_clock():
+    """
+    Часы процесса: класс из JWTAPP['CLOCK'], по умолчанию SystemClock
+    """
+    global _clock
+    if _clock is None:
+        from .settings import api_settings
+        _clock = (api_settings.CLOCK or SystemClock)()
+    return _clock
+
+
+def set_clock(clock):
+    """
+    Подменяет часы процесса (None - вернуться к JWTAPP['CLOCK']). Возвращает прежние часы
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def epoch_now():
+    return get_clock()()
 
 
 def make_utc(dt):
     if settings.USE_TZ and is_naive(dt):
-        return make_aware(dt, timezone=utc)
+        return make_aware(dt, timezone=timezone.utc)
     return dt
 
 
 def aware_utcnow():
-    return make_utc(datetime.utcnow())
+    return datetime_from_epoch(epoch_now())
 
 
 def datetime_to_epoch(dt):
@@ -19,4 +90,7 @@ def datetime_to_epoch(dt):
 
 
 def datetime_from_epoch(ts):
-    return make_utc(datetime.utcfromtimestamp(ts))
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    if settings.USE_TZ:
+        return dt
+    return dt.replace(tzinfo=None)
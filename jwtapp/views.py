@@ -1,10 +1,19 @@
 from django.utils.module_loading import import_string
 from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from .buckets import bucket_period, token_model_pairs
 from .exceptions import InvalidToken, TokenError
-from .serializers import RotatedRefreshTokenSerializer
+from .pagination import BucketSessionCursorPagination, SessionCursorPagination
+from .routers import remember_user_ids
+from .serializers import OutstandingTokenSerializer, RotatedRefreshTokenSerializer
 from .settings import api_settings
+from .sharding import database_for_user
+from .throttling import TokenObtainThrottle, admission_slot
+from .tokens import revoke_all_sessions
 from .authentication import AUTH_HEADER_TYPES
+from .utils import aware_utcnow
 
 
 class TokenViewBase(generics.GenericAPIView):
@@ -16,6 +25,8 @@ class TokenViewBase(generics.GenericAPIView):
     serializer_class = None
     _serializer_class = ""
     www_authenticate_realm = "api"
+    # Ограничение одновременных запросов с хешированием пароля (TOKEN_OBTAIN_MAX_CONCURRENT)
+    admission_control = False
 
     def get_serializer_class(self):
         """
@@ -33,6 +44,12 @@ class TokenViewBase(generics.GenericAPIView):
         return f'{AUTH_HEADER_TYPES[0]} realm="{self.www_authenticate_realm}"'
 
     def post(self, request, *args, **kwargs):
+        if self.admission_control:
+            with admission_slot():
+                return self.validate_token_request(request)
+        return self.validate_token_request(request)
+
+    def validate_token_request(self, request):
         serializer = self.get_serializer(data=request.data)
         try:
             serializer.is_valid(raise_exception=True)
@@ -46,6 +63,24 @@ class TokenObtainPairView(TokenViewBase):
     Принимает имя пользователя и пароль, возвращает пару Access и Refresh токенов
     """
     _serializer_class = api_settings.TOKEN_OBTAIN_SERIALIZER
+    throttle_classes = (TokenObtainThrottle,)
+    admission_control = True
+
+
+class TokenObtainSlidingView(TokenViewBase):
+    """
+    Принимает имя пользователя и пароль, возвращает sliding токен
+    """
+    _serializer_class = api_settings.SLIDING_TOKEN_OBTAIN_SERIALIZER
+    throttle_classes = (TokenObtainThrottle,)
+    admission_control = True
+
+
+class TokenRefreshSlidingView(TokenViewBase):
+    """
+    Принимает sliding токен, возвращает его обновлённую копию
+    """
+    _serializer_class = api_settings.SLIDING_TOKEN_REFRESH_SERIALIZER
 
 
 class TokenRefreshView(TokenViewBase):
@@ -67,3 +102,59 @@ class RotatedRefreshTokenView(TokenViewBase):
     Обновляет пару Access и Refresh токенов
     """
     serializer_class = RotatedRefreshTokenSerializer
+
+
+class SessionListView(generics.ListAPIView):
+    """
+    Возвращает активные сессии (незавершенные refresh токены) текущего пользователя
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = OutstandingTokenSerializer
+    pagination_class = SessionCursorPagination
+
+    def get_queryset(self):
+        return alive_sessions(self.request.user)[0]
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            # Токены в нескольких таблицах периодов: курсор сливает страницы всех таблиц
+            pagination_class = self.pagination_class if bucket_period() is None else BucketSessionCursorPagination
+            self._paginator = pagination_class()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        if bucket_period() is None:
+            return super().list(request, *args, **kwargs)
+        page = self.paginator.paginate_querysets(alive_sessions(request.user, cached=True), request, self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+def alive_sessions(user, cached=False):
+    """
+    Выборки незавершенных токенов пользователя: основная таблица и таблицы неистёкших периодов.
+    cached=True - список периодов из кеша процесса (см. jwtapp.buckets.existing_buckets)
+    """
+    db = database_for_user(user)
+    now = aware_utcnow()
+    return [
+        outstanding_model.objects.using(db).alive(now).filter(user_id=user.pk)
+        for outstanding_model, _ in token_model_pairs(db, now, cached)
+    ]
+
+
+class SessionRevokeAllView(APIView):
+    """
+    Добавляет в чёрный список все активные сессии текущего пользователя одним запросом и запоминает
+    момент завершения: токены без записей OutstandingToken (TRACK_OUTSTANDING_TOKENS = False)
+    отклоняются по нему
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        blacklisted = sum(tokens.blacklist() for tokens in alive_sessions(request.user))
+        revoke_all_sessions(request.user)
+        # Следующие проверки токенов пользователя читают черный список из основной БД, а не с реплики
+        remember_user_ids([getattr(request.user, api_settings.USER_ID_FIELD)])
+        return Response({'blacklisted': blacklisted}, status=status.HTTP_200_OK)
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, router
+from .audit import get_audit_log
+from .exceptions import TokenBackendError
+from .rotation import get_rotation_cache
+from .settings import DEFAULTS, api_settings
+
+
+def validate_signing_keys():
+    """
+    Проверяет ключи подписи и проверки против ALGORITHM, ошибка конфигурации - ImproperlyConfigured
+    """
+    from .state import token_backend
+    try:
+        token_backend.validate_keys()
+    except TokenBackendError as ex:
+        raise ImproperlyConfigured(f'JWTAPP: {ex}') from ex
+
+
+def warm_up(connect=False):
+    """
+    Выполняет отложенную инициализацию до первого запроса: разбор настроек и import strings,
+    разбор ключей подписи, соль bcrypt, кеш ротации и журнал аудита.
+    connect=True также открывает соединения с БД токенов и пользователей (вызывается после fork воркера)
+    """
+    for name in DEFAULTS:
+        getattr(api_settings, name)
+
+    from .state import token_backend
+    from .tokens import AccessToken, get_salt
+    if api_settings.VALIDATE_KEYS_ON_READY:
+        validate_signing_keys()
+    get_salt()
+    if token_backend.signing_key:
+        token = str(AccessToken())
+        if not token_backend.jwk_url:
+            try:
+                token_backend.decode(token)
+            except TokenBackendError:
+                pass
+
+    # Возвращают None, если кеш ротации или аудит выключены
+    get_rotation_cache()
+    get_audit_log()
+
+    if connect:
+        from .sharding import token_databases
+        from .tokens_models.models import OutstandingToken
+        aliases = {*token_databases(OutstandingToken), router.db_for_read(get_user_model())}
+        for alias in aliases:
+            connections[alias].ensure_connection()